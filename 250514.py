@@ -1,53 +1,104 @@
-    def visualize_axial_distribution(self, z_positions, filename=None, title=None):
+    def visualize_axial_distribution(self, z_positions, filename=None, title=None, mode='grid',
+                                     z_indices=None, ncols=4, color_map='viridis', max_labels=0, interval=200):
         """
         ピン配置と軸方向分布の可視化
 
+        各軸方向スライスを PolyCollection 1つの格子マップとして描画するため、
+        スライスあたりのアーティスト数はピン数に依らず一定。
+
         Args:
             z_positions (list): 軸方向の位置リスト
-            filename (str): 保存するファイル名（Noneの場合は保存しない）
+            filename (str): 保存するファイル名（Noneの場合は保存しない）。
+                'animation' モードでは .gif / .mp4 など
             title (str): グラフのタイトル
+            mode (str): 'grid'（スライスの小さな図を並べる）または 'animation'（スライスを順に表示）
+            z_indices (list, optional): 描画するスライスの番号（省略時は全スライス）
+            ncols (int): 'grid' モードの列数
+            color_map (str): カラーマップ名（全スライスで共通のカラースケール）
+            max_labels (int): スライスごとに表示する値ラベル数の上限（既定はラベルなし）
+            interval (int): 'animation' モードのフレーム間隔 [ms]
 
         Returns:
-            matplotlib.figure.Figure: 作成した図
+            matplotlib.figure.Figure または matplotlib.animation.FuncAnimation
         """
-
-        fig, ax = plt.subplots(figsize=(10, 8))
-
-        # 六角形のピンを描画
-        for pin in self.grid.pins:
-            x, y = pin.coordinates
-            hex_radius = self.grid.pitch / 2 * 0.9
-            hexagon = RegularPolygon((x, y), numVertices=6, radius=hex_radius,
-                                    orientation=0, alpha=0.7, edgecolor='k')
-            ax.add_patch(hexagon)
-
-            # 軸方向分布をプロット
-            if pin.value is not None and isinstance(pin.value, list):
-                # プロット位置を調整
-                text_x = x + self.grid.pitch * 0.6
-                text_y = y - self.grid.pitch * 0.6
-                ax.text(text_x, text_y, f"S:{pin.id}", ha='left', va='top', fontsize=6)  # IDを小さく表示
-                for i, z in enumerate(z_positions):
-                    val = pin.value[i]
-                    ax.plot([x, x + self.grid.pitch * 0.5], [y - i * self.grid.pitch * 0.1, y - i * self.grid.pitch * 0.1], marker='o', markersize=2, color='r')
-                    ax.text(x + self.grid.pitch * 0.55, y - i * self.grid.pitch * 0.1, f"{val:.1f}", ha='left', va='center', fontsize=6)
-
-        # グラフの設定
-        ax.set_aspect('equal')
-        ax.autoscale_view()
-        ax.set_xlabel('X')
-        ax.set_ylabel('Y')
-
-        if title:
-            ax.set_title(title)
-        else:
-            ax.set_title('ピン配置と軸方向分布')
+        from matplotlib.colors import Normalize
+
+        values = self.grid.column('value')
+        if values.ndim != 2:
+            raise ValueError("軸方向分布の値が割り当てられていません")
+        if z_indices is None:
+            z_indices = range(values.shape[1])
+        z_indices = list(z_indices)
+        if not z_indices:
+            raise ValueError("描画する軸方向スライスが指定されていません")
+
+        x = self.grid.column('x')
+        y = self.grid.column('y')
+        norm = Normalize(vmin=np.nanmin(values[:, z_indices]), vmax=np.nanmax(values[:, z_indices]))
+        vertices = hexagon_vertices(x, y, self.grid.pitch / 2 * 0.9)
+        title = title or 'ピン配置と軸方向分布'
+
+        def add_slice(ax):
+            collection = PolyCollection(vertices, cmap=color_map, norm=norm, alpha=0.7, edgecolors='k',
+                                        linewidths=0.3)
+            ax.add_collection(collection)
+            ax.set_aspect('equal')
+            ax.autoscale_view()
+            return collection
+
+        def slice_labels(ax):
+            n = len(x)
+            step = math.ceil(n / max_labels) if max_labels and n > max_labels else 1
+            indices = np.arange(0, n, step) if max_labels else np.arange(0)
+            return indices, [ax.text(x[i], y[i], '', ha='center', va='center', fontsize=6) for i in indices]
+
+        if mode == 'animation':
+            from matplotlib.animation import FuncAnimation
+
+            fig, ax = plt.subplots(figsize=(10, 8))
+            collection = add_slice(ax)
+            fig.colorbar(collection, ax=ax).set_label('Value')
+            ax.set_xlabel('X')
+            ax.set_ylabel('Y')
+            indices, texts = slice_labels(ax)
+
+            def draw_frame(frame):
+                z_index = z_indices[frame]
+                collection.set_array(values[:, z_index])
+                for text, val in zip(texts, values[indices, z_index].tolist()):
+                    text.set_text(f"{val:.1f}")
+                ax.set_title(f"{title} (z = {z_positions[z_index]})")
+                return [collection, *texts]
+
+            animation = FuncAnimation(fig, draw_frame, frames=len(z_indices), interval=interval, blit=False)
+            if filename:
+                animation.save(filename)
+            return animation
+
+        # スライスの小さな図を並べて描画
+        ncols = min(ncols, len(z_indices))
+        nrows = math.ceil(len(z_indices) / ncols)
+        fig, axes = plt.subplots(nrows, ncols, figsize=(3 * ncols, 3 * nrows), squeeze=False)
+        collection = None
+        for ax, z_index in zip(axes.flat, z_indices):
+            collection = add_slice(ax)
+            collection.set_array(values[:, z_index])
+            indices, texts = slice_labels(ax)
+            for text, val in zip(texts, values[indices, z_index].tolist()):
+                text.set_text(f"{val:.1f}")
+            ax.set_title(f"z = {z_positions[z_index]}", fontsize=8)
+            ax.set_xticks([])
+            ax.set_yticks([])
+        for ax in axes.flat[len(z_indices):]:
+            ax.set_visible(False)
+
+        fig.colorbar(collection, ax=axes, shrink=0.8).set_label('Value')
+        fig.suptitle(title)
 
         # ファイルに保存
         if filename:
-            plt.savefig(filename, dpi=300, bbox_inches='tight')
+            fig.savefig(filename, dpi=300, bbox_inches='tight')
 
-        plt.tight_layout()
         return fig
 
 
@@ -82,6 +133,8 @@
 class SevenPointInterpolation(InterpolationStrategy):
     """7点補間による値の割り当て (軸方向分布対応)"""
 
+    supports_weights = True
+
     def interpolate(self, pins, input_values):
         """
         中心の値と六角形の頂点位置の値（6点）による7点補間。
@@ -94,6 +147,28 @@ class SevenPointInterpolation(InterpolationStrategy):
                 'vertex_values': list    # 六角形の頂点位置の値のリスト (各頂点も軸方向分布)
                 'z_positions': list      # 軸方向の位置リスト (例: [0.0, 0.2, 0.4, 0.6, 0.8, 1.0])
             }
+
+        Returns:
+            numpy.ndarray: (ピン数, 軸方向点数) の値。各ピンの value はこの配列の行ビュー
+        """
+        values = self.evaluate(self.prepare(pins), input_values)
+        store_pin_values(pins, values)
+        return values
+
+    def compute_factors(self, x, y, ring):
+        """角度・セクター・リング比はz方向に依らないのでピンごとに1回だけ計算"""
+        return _sector_factors(x, y, ring)
+
+    def evaluate(self, factors, input_values):
+        """
+        係数と軸方向分布の入力値から (ピン数, 軸方向点数) の値を一括計算
+
+        Args:
+            factors (dict): compute_factors() の結果
+            input_values (dict): interpolate() と同じ入力値
+
+        Returns:
+            numpy.ndarray: (ピン数, 軸方向点数) の連続配列
         """
         center_values = input_values.get('center_values', [100.0])  # デフォルトは一律の値
         vertex_values = input_values.get('vertex_values', [[80.0] * len(center_values)] * 6) # デフォルトは一律の値
@@ -102,34 +177,68 @@ class SevenPointInterpolation(InterpolationStrategy):
         if len(vertex_values) != 6 or any(len(v) != len(center_values) for v in vertex_values):
             raise ValueError("頂点データの次元が不正です")
 
-        max_ring = max(pin.ring for pin in pins)
         num_z = len(z_positions)
+        if num_z > len(center_values):
+            raise ValueError("軸方向の位置の数が分布データの点数を超えています")
+
+        center_values = np.asarray(center_values, dtype=np.float64)[:num_z]  # (num_z,)
+        vertex_values = np.asarray(vertex_values, dtype=np.float64)[:, :num_z]  # (6, num_z)
+
+        # 頂点値の補間（セクターごとの頂点分布を行として取り出す）
+        sector_pos = factors['sector_pos'][:, np.newaxis]
+        interpolated_value = (vertex_values[factors['sector']] * (1 - sector_pos)
+                              + vertex_values[factors['next_sector']] * sector_pos)
 
-        for pin in pins:
-            pin.value = []  # 軸方向の値を格納するリストとして初期化
+        # リング方向の補間
+        ring_ratio = factors['ring_ratio'][:, np.newaxis]
+        values = center_values + (interpolated_value - center_values) * ring_ratio
 
-            for z_index in range(num_z):
-                # 中心の値
-                if pin.ring == 0:
-                    pin.value.append(center_values[z_index])
-                else:
-                    # 角度計算
-                    angle = math.atan2(pin.coordinates[1], pin.coordinates[0])
-                    if angle < 0:
-                        angle += 2 * math.pi
+        # 中心の値
+        values[factors['center']] = center_values
+        return np.ascontiguousarray(values)
 
-                    angle_deg = math.degrees(angle)
-                    sector = int(angle_deg / 60)
-                    next_sector = (sector + 1) % 6
-                    sector_pos = (angle_deg - sector * 60) / 60
+    def input_vector(self, input_values):
+        """
+        入力値を (7, 軸方向点数) の行列に変換（行は [中心, 頂点1〜6]）
 
-                    # 頂点値の補間
-                    interpolated_value = vertex_values[sector][z_index] * (1 - sector_pos) + vertex_values[next_sector][z_index] * sector_pos
+        重み行列は z 方向に依らないので、weight_matrix() との積で (ピン数, 軸方向点数) の値になる。
+        """
+        center_values = input_values.get('center_values', [100.0])
+        vertex_values = input_values.get('vertex_values', [[80.0] * len(center_values)] * 6)
+        num_z = len(input_values.get('z_positions', [0.0]))
+        return np.vstack([np.asarray(center_values, dtype=np.float64)[np.newaxis, :num_z],
+                          np.asarray(vertex_values, dtype=np.float64)[:, :num_z]])
+
+    def weight_matrix(self, factors):
+        """(ピン数, 7) の重み行列を作成（全軸方向位置で共通）"""
+        return _sector_weight_matrix(factors)
+
+    def vector_to_input_values(self, vector):
+        """(7, 軸方向点数) の行列を入力値の辞書に（z_positions は含まない）"""
+        vector = np.atleast_2d(np.asarray(vector, dtype=np.float64).T).T
+        return {'center_values': vector[0].tolist(), 'vertex_values': vector[1:].tolist()}
+
+    def fit(self, pins, pin_values, z_positions=None):
+        """
+        軸方向分布を持つピンの値から、軸方向位置ごとの中心値・頂点値を最小二乗で求める
 
-                    # リング方向の補間
-                    ring_ratio = pin.ring / max_ring
-                    center_to_vertex_diff = interpolated_value - center_values[z_index]
-                    pin.value.append(center_values[z_index] + center_to_vertex_diff * ring_ratio)
+        Args:
+            pins (list): Pinオブジェクトのリスト
+            pin_values (array-like): (ピン数, 軸方向点数) の値
+            z_positions (list, optional): 軸方向の位置（省略時は 0〜1 の等間隔）
+
+        Returns:
+            dict: interpolate() に渡せる入力値（center_values, vertex_values, z_positions）
+        """
+        pin_values = np.asarray(pin_values, dtype=np.float64)
+        if pin_values.ndim == 1:
+            pin_values = pin_values[:, np.newaxis]
+        input_values = super().fit(pins, pin_values)
+        num_z = pin_values.shape[1]
+        if z_positions is None:
+            z_positions = [i / (num_z - 1) for i in range(num_z)] if num_z > 1 else [0.0]
+        input_values['z_positions'] = list(z_positions)
+        return input_values
 
 
 
@@ -190,10 +299,12 @@ def main():
         Args:
             spiral_id_values (dict): 螺旋IDをキー、値を値とする辞書
         """
-        for spiral_id, value in spiral_id_values.items():
-            pin = self.grid.get_pin_by_spiral_id(spiral_id)
-            if pin:
-                pin.value = value
+        spiral_ids = list(spiral_id_values.keys())
+        # 螺旋IDの索引で一括検索（ピン数に対して線形）
+        indices = self.grid.get_pin_indices_by_spiral_ids(spiral_ids)
+        for spiral_id, index in zip(spiral_ids, indices):
+            if index >= 0:
+                self.grid.pins[index].value = spiral_id_values[spiral_id]
             else:
                 print(f"警告: 螺旋ID {spiral_id} に対応するピンが見つかりません。")
 
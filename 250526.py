@@ -28,7 +28,14 @@ print(result)  # 出力: data_1_2_3_4
 
 
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Type
+from typing import Dict, List, Any, Type, Callable, Iterable, Iterator, Tuple, Optional
+from collections import deque
+import ast
+import copy
+import math
+import os
+import numpy as np
+import pandas as pd
 import yaml
 import json
 import csv
@@ -40,6 +47,26 @@ class Converter(ABC):
     def convert(self, data: Dict) -> Any:
         """入力データを変換して返す抽象メソッド"""
         pass
+    
+    def bind(self, source_variables: List[str]) -> Callable[[Dict], Any]:
+        """
+        入力変数名を固定した変換関数を返す（ConversionPlan から使用）
+        返す関数はソースデータ全体を受け取り、必要な変数だけを取り出して変換する
+        """
+        names = tuple(dict.fromkeys(source_variables))
+        convert = self.convert
+        return lambda source_data: convert({name: source_data[name] for name in names})
+    
+    def convert_array(self, data: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        列（NumPy配列）単位で変換する
+        既定では1行ずつ convert() を呼ぶので、配列演算できる Converter はオーバーライドする
+        各行の値は tolist() で Python の int / float に戻してから渡す（NumPy のスカラーのままだと
+        整数の負のべき乗や0除算が1レコードの変換と異なる結果になる）
+        """
+        names = list(data)
+        rows = zip(*(np.asarray(data[name]).tolist() for name in names))
+        return np.array([self.convert(dict(zip(names, row))) for row in rows])
 
 
 # 単純な1対1の変換を行うConverter
@@ -57,6 +84,21 @@ class SimpleConverter(Converter):
             value = value * self.params["scaling_factor"]
         
         return value
+    
+    def bind(self, source_variables: List[str]) -> Callable[[Dict], Any]:
+        """先頭の入力変数だけを使う変換関数"""
+        name = source_variables[0]
+        scaling_factor = self.params.get("scaling_factor")
+        if not scaling_factor:
+            return lambda source_data: source_data[name]
+        return lambda source_data: source_data[name] * scaling_factor
+    
+    def convert_array(self, data: Dict[str, np.ndarray]) -> np.ndarray:
+        """先頭の入力列を変換（入力の配列は結果と共有しない）"""
+        value = data[next(iter(data))]
+        if self.params.get("scaling_factor"):
+            return value * self.params["scaling_factor"]
+        return value.copy()
 
 
 # 単位変換を行うConverter
@@ -71,27 +113,380 @@ class UnitConverter(Converter):
         """単位変換を行う"""
         value = data.get(list(data.keys())[0])
         return value * self.conversion_factor
+    
+    def bind(self, source_variables: List[str]) -> Callable[[Dict], Any]:
+        """先頭の入力変数に係数を掛ける変換関数"""
+        name = source_variables[0]
+        factor = self.conversion_factor
+        return lambda source_data: source_data[name] * factor
+    
+    def convert_array(self, data: Dict[str, np.ndarray]) -> np.ndarray:
+        """先頭の入力列に係数を掛ける"""
+        return data[next(iter(data))] * self.conversion_factor
+
+
+# 数式のコンパイル: 数式を1回だけ構文解析し、許可した演算子・関数だけからなることを
+# 確認したうえで、1レコード用と列（NumPy配列）用の関数を作る
+def _vector_log(x, base=None):
+    """math.log(x[, base]) の配列版"""
+    return np.log(x) if base is None else np.log(x) / np.log(base)
+
+
+def _vector_extreme(pick_new):
+    """組み込みの min / max と同じ順序・比較で要素ごとに選ぶ関数を作る"""
+    def extreme(*values):
+        if len(values) == 1:
+            raise TypeError("min/max of a single argument is not supported in formulas")
+        result = values[0]
+        for value in values[1:]:
+            result = np.where(pick_new(value, result), value, result)
+        return result
+    return extreme
+
+
+def _vector_integral(function):
+    """math.floor / ceil / trunc と同じく整数（int64）を返す配列版を作る"""
+    def integral(x):
+        result = np.asarray(function(x))
+        if not np.all(np.isfinite(result)):
+            raise ValueError("cannot convert float NaN or infinity to integer")
+        if np.any(np.abs(result) >= 2.0 ** 63):
+            raise OverflowError("integer result does not fit in int64")
+        return result.astype(np.int64)[()]
+    return integral
+
+
+# 使用できる関数: 名前 -> (1レコード用, 列用)
+_MATH_FUNCTIONS = {
+    "sqrt": (math.sqrt, np.sqrt), "exp": (math.exp, np.exp), "log": (math.log, _vector_log),
+    "log10": (math.log10, np.log10), "log2": (math.log2, np.log2),
+    "sin": (math.sin, np.sin), "cos": (math.cos, np.cos), "tan": (math.tan, np.tan),
+    "asin": (math.asin, np.arcsin), "acos": (math.acos, np.arccos), "atan": (math.atan, np.arctan),
+    "atan2": (math.atan2, np.arctan2), "sinh": (math.sinh, np.sinh), "cosh": (math.cosh, np.cosh),
+    "tanh": (math.tanh, np.tanh), "hypot": (math.hypot, np.hypot), "pow": (math.pow, np.power),
+    "floor": (math.floor, _vector_integral(np.floor)), "ceil": (math.ceil, _vector_integral(np.ceil)),
+    "trunc": (math.trunc, _vector_integral(np.trunc)),
+    "fabs": (math.fabs, np.fabs), "copysign": (math.copysign, np.copysign),
+    "degrees": (math.degrees, np.degrees), "radians": (math.radians, np.radians),
+}
+_MATH_CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau, "inf": math.inf}
+_NUMPY_FUNCTIONS = (
+    "sqrt", "exp", "log", "log10", "log2", "sin", "cos", "tan", "arcsin", "arccos", "arctan",
+    "arctan2", "sinh", "cosh", "tanh", "hypot", "power", "floor", "ceil", "trunc", "abs", "fabs",
+    "sign", "copysign", "degrees", "radians", "minimum", "maximum", "where", "clip",
+)
+_NUMPY_CONSTANTS = {"pi": np.pi, "e": np.e, "inf": np.inf, "nan": np.nan}
+_BUILTIN_FUNCTIONS = {
+    "abs": (abs, np.abs),
+    "min": (min, _vector_extreme(lambda new, current: new < current)),
+    "max": (max, _vector_extreme(lambda new, current: new > current)),
+}
+# import できるモジュール: 名前 -> 実体の名前
+_FORMULA_MODULES = {"math": "math", "numpy": "numpy", "np": "numpy"}
+
+# 定数のべき指数の上限（9**9**9 のような巨大な整数の計算を数式の検査で拒否する）
+_MAX_CONSTANT_EXPONENT = 1000
+
+_ALLOWED_OPERATORS = (
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub, ast.Not, ast.And, ast.Or,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+# 定数式の見積もりに使う演算（float で計算する）
+_CONSTANT_OPERATORS = {
+    ast.Add: float.__add__, ast.Sub: float.__sub__, ast.Mult: float.__mul__, ast.Div: float.__truediv__,
+    ast.FloorDiv: float.__floordiv__, ast.Mod: float.__mod__, ast.Pow: float.__pow__,
+}
+
+
+class _FormulaTransformer(ast.NodeTransformer):
+    """検査済みの数式 AST を関数本体に書き換える（変数は __data[...] の参照にする）"""
+    
+    def __init__(self, imports: Dict[str, str], vector: bool):
+        self.imports = imports
+        self.vector = vector
+        self.namespace = {"__builtins__": {}}
+    
+    def _bind(self, key: str, value: Any) -> ast.Name:
+        """関数・定数を名前空間に登録して参照する"""
+        self.namespace[key] = value
+        return ast.Name(id=key, ctx=ast.Load())
+    
+    def _call(self, key: str, value: Callable, args: List[ast.AST]) -> ast.Call:
+        return ast.Call(func=self._bind(key, value), args=args, keywords=[])
+    
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        return ast.Subscript(value=ast.Name(id="__data", ctx=ast.Load()),
+                             slice=ast.Constant(value=node.id), ctx=ast.Load())
+    
+    def visit_Attribute(self, node: ast.Attribute) -> ast.AST:
+        module = self.imports[node.value.id]
+        if module == "math":
+            if node.attr in _MATH_CONSTANTS:
+                return self._bind(f"__math_{node.attr}", _MATH_CONSTANTS[node.attr])
+            return self._bind(f"__math_{node.attr}", _MATH_FUNCTIONS[node.attr][self.vector])
+        if node.attr in _NUMPY_CONSTANTS:
+            return self._bind(f"__np_{node.attr}", _NUMPY_CONSTANTS[node.attr])
+        return self._bind(f"__np_{node.attr}", getattr(np, node.attr))
+    
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        args = [self.visit(arg) for arg in node.args]
+        if isinstance(node.func, ast.Name):
+            function = _BUILTIN_FUNCTIONS[node.func.id][self.vector]
+            return self._call(f"__builtin_{node.func.id}", function, args)
+        return ast.Call(func=self.visit(node.func), args=args, keywords=[])
+    
+    # 列用ではブール演算・比較の連鎖・条件式を要素ごとの演算にする（Python と同じ値を返す形で）
+    def visit_BoolOp(self, node: ast.BoolOp) -> ast.AST:
+        if not self.vector:
+            return self.generic_visit(node)
+        values = [self.visit(value) for value in node.values]
+        if isinstance(node.op, ast.Or):
+            key, function = "__or", lambda a, b: np.where(a, a, b)
+        else:
+            key, function = "__and", lambda a, b: np.where(a, b, a)
+        result = values[0]
+        for value in values[1:]:
+            result = self._call(key, function, [result, value])
+        return result
+    
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> ast.AST:
+        if self.vector and isinstance(node.op, ast.Not):
+            return self._call("__not", np.logical_not, [self.visit(node.operand)])
+        return self.generic_visit(node)
+    
+    def visit_Compare(self, node: ast.Compare) -> ast.AST:
+        if not self.vector or len(node.ops) == 1:
+            return self.generic_visit(node)
+        operands = [self.visit(node.left)] + [self.visit(value) for value in node.comparators]
+        result = None
+        for left, op, right in zip(operands, node.ops, operands[1:]):
+            comparison = ast.Compare(left=left, ops=[op], comparators=[right])
+            result = comparison if result is None else self._call("__all", np.logical_and, [result, comparison])
+        return result
+    
+    def visit_IfExp(self, node: ast.IfExp) -> ast.AST:
+        if not self.vector:
+            return self.generic_visit(node)
+        return self._call("__where", np.where,
+                          [self.visit(node.test), self.visit(node.body), self.visit(node.orelse)])
+
+
+class CompiledFormula:
+    """
+    安全にコンパイルした数式
+    数式は1回だけ構文解析し、変数・数値定数・四則演算/べき乗・比較・ブール演算・条件式と、
+    許可した関数（abs, min, max と imports に指定した math / numpy の関数）だけを受け付ける
+    定数のべき指数は _MAX_CONSTANT_EXPONENT まで、定数どうしのべき乗は float の範囲までに限る
+    """
+    
+    def __init__(self, formula: str, imports: List[str] = None):
+        self.formula = formula
+        self.imports = {}
+        for name in imports or []:
+            if name not in _FORMULA_MODULES:
+                raise ValueError(f"Module '{name}' cannot be imported in formula '{formula}'")
+            self.imports[name] = _FORMULA_MODULES[name]
+        
+        try:
+            tree = ast.parse(formula.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Error evaluating formula '{formula}': {str(e)}")
+        self.variables = self._validate(tree)
+        self.scalar = self._build(tree, vector=False)
+        self.vector = self._build(tree, vector=True)
+    
+    def _reject(self, node: ast.AST, reason: str = None):
+        reason = reason or f"'{type(node).__name__}' is not allowed"
+        raise ValueError(f"Unsafe formula '{self.formula}': {reason}")
+    
+    def _validate(self, tree: ast.Expression) -> Tuple[str, ...]:
+        """許可リストで AST を検査し、数式中の変数名を出現順に返す"""
+        variables = {}
+        
+        def check_function(func: ast.AST):
+            if isinstance(func, ast.Name):
+                if func.id not in _BUILTIN_FUNCTIONS:
+                    self._reject(func, f"function '{func.id}' is not allowed")
+                return
+            if not (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name)):
+                self._reject(func, "only functions of imported modules can be called")
+            check_attribute(func, callable_only=True)
+        
+        def check_attribute(node: ast.Attribute, callable_only: bool = False):
+            if not isinstance(node.value, ast.Name):
+                self._reject(node, "only attributes of imported modules can be used")
+            module = self.imports.get(node.value.id)
+            if module is None:
+                self._reject(node, f"module '{node.value.id}' is not listed in imports")
+            functions = _MATH_FUNCTIONS if module == "math" else _NUMPY_FUNCTIONS
+            constants = _MATH_CONSTANTS if module == "math" else _NUMPY_CONSTANTS
+            if node.attr in functions or (not callable_only and node.attr in constants):
+                return
+            self._reject(node, f"'{node.value.id}.{node.attr}' is not allowed")
+        
+        def visit(node: ast.AST):
+            if isinstance(node, ast.Expression):
+                visit(node.body)
+            elif isinstance(node, ast.Constant):
+                if type(node.value) not in (int, float, bool):
+                    self._reject(node, f"constant {node.value!r} is not allowed")
+            elif isinstance(node, ast.Name):
+                if node.id.startswith("__"):
+                    self._reject(node, f"name '{node.id}' is not allowed")
+                variables[node.id] = None
+            elif isinstance(node, ast.Attribute):
+                check_attribute(node)
+            elif isinstance(node, ast.Call):
+                if node.keywords:
+                    self._reject(node, "keyword arguments are not allowed")
+                check_function(node.func)
+                for arg in node.args:
+                    if isinstance(arg, ast.Starred):
+                        self._reject(arg)
+                    visit(arg)
+            elif isinstance(node, ast.BinOp):
+                visit_operator(node.op)
+                visit(node.left)
+                visit(node.right)
+                if isinstance(node.op, ast.Pow):
+                    check_power(node)
+            elif isinstance(node, ast.UnaryOp):
+                visit_operator(node.op)
+                visit(node.operand)
+            elif isinstance(node, ast.BoolOp):
+                visit_operator(node.op)
+                for value in node.values:
+                    visit(value)
+            elif isinstance(node, ast.Compare):
+                for op in node.ops:
+                    visit_operator(op)
+                visit(node.left)
+                for value in node.comparators:
+                    visit(value)
+            elif isinstance(node, ast.IfExp):
+                visit(node.test)
+                visit(node.body)
+                visit(node.orelse)
+            else:
+                self._reject(node)
+        
+        def constant_value(node: ast.AST) -> Optional[float]:
+            """定数だけからなる式の値（float で見積もり、桁あふれは inf）。変数を含めば None"""
+            if isinstance(node, ast.Constant):
+                return float(node.value)
+            if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+                value = constant_value(node.operand)
+                return None if value is None else (-value if isinstance(node.op, ast.USub) else value)
+            if isinstance(node, ast.BinOp) and type(node.op) in _CONSTANT_OPERATORS:
+                left, right = constant_value(node.left), constant_value(node.right)
+                if left is None or right is None:
+                    return None
+                try:
+                    value = _CONSTANT_OPERATORS[type(node.op)](left, right)
+                except OverflowError:
+                    return math.inf
+                except (ZeroDivisionError, ValueError):
+                    return None
+                return value if isinstance(value, float) else None
+            return None
+        
+        def check_power(node: ast.BinOp):
+            exponent = constant_value(node.right)
+            if exponent is None:
+                return
+            if not abs(exponent) <= _MAX_CONSTANT_EXPONENT:
+                self._reject(node, f"constant exponent exceeds {_MAX_CONSTANT_EXPONENT}")
+            value = constant_value(node)
+            if value is not None and math.isinf(value):
+                self._reject(node, "constant power is too large")
+        
+        def visit_operator(op: ast.AST):
+            if not isinstance(op, _ALLOWED_OPERATORS):
+                self._reject(op, f"operator '{type(op).__name__}' is not allowed")
+        
+        visit(tree)
+        return tuple(variables)
+    
+    def _build(self, tree: ast.Expression, vector: bool) -> Callable[[Dict], Any]:
+        """検査済みの AST から「データ辞書 -> 値」の関数を作る"""
+        transformer = _FormulaTransformer(self.imports, vector)
+        body = transformer.visit(copy.deepcopy(tree.body))
+        arguments = ast.arguments(posonlyargs=[], args=[ast.arg(arg="__data")], vararg=None,
+                                  kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[])
+        expression = ast.fix_missing_locations(ast.Expression(body=ast.Lambda(args=arguments, body=body)))
+        return eval(compile(expression, "<formula>", "eval"), transformer.namespace)
+    
+    def evaluate(self, data: Dict) -> Any:
+        """1レコードの値で評価"""
+        try:
+            return self.scalar(data)
+        except KeyError as e:
+            raise NameError(f"name {e.args[0]!r} is not defined") from None
+    
+    def evaluate_array(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """列（NumPy配列）で一括評価"""
+        try:
+            return self.vector(columns)
+        except KeyError as e:
+            raise NameError(f"name {e.args[0]!r} is not defined") from None
 
 
 # Composite パターン: 複数入力変数を扱うConverter
 class CompositeConverter(Converter):
     def __init__(self, params: Dict = None):
         self.params = params or {}
+        self._compiled = None
+    
+    @property
+    def compiled(self) -> CompiledFormula:
+        """コンパイル済みの数式（初回の使用時に1回だけコンパイル）"""
+        if self._compiled is None:
+            self._compiled = CompiledFormula(self.params.get("formula", ""), self.params.get("imports"))
+        return self._compiled
     
     def convert(self, data: Dict) -> Any:
         """
         複数の入力変数を組み合わせて変換
         パラメータの'formula'キーに数式を定義
-        例: "x + y" や "x * 2 + y / 3" など
+        例: "x + y" や "x * 2 + y / 3"、imports: ["math"] を指定すれば "math.atan2(y, x)" など
         """
-        formula = self.params.get("formula", "")
-        locals_dict = data.copy()
-        
+        formula = self.compiled
         try:
-            result = eval(formula, {"__builtins__": {}}, locals_dict)
-            return result
+            return formula.evaluate(data)
         except Exception as e:
-            raise ValueError(f"Error evaluating formula '{formula}': {str(e)}")
+            raise ValueError(f"Error evaluating formula '{formula.formula}': {str(e)}")
+    
+    def bind(self, source_variables: List[str]) -> Callable[[Dict], Any]:
+        """コンパイル済みの数式で変換する関数（数式中の変数は入力変数に限る）"""
+        formula = self.compiled
+        for name in formula.variables:
+            if name not in source_variables:
+                raise ValueError(
+                    f"Error evaluating formula '{formula.formula}': name '{name}' is not defined")
+        evaluate = formula.scalar
+        
+        def convert(source_data: Dict) -> Any:
+            try:
+                return evaluate(source_data)
+            except KeyError:
+                # 入力変数の不足は ConversionPlan が報告する
+                raise
+            except Exception as e:
+                raise ValueError(f"Error evaluating formula '{formula.formula}': {str(e)}")
+        return convert
+    
+    def convert_array(self, data: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        コンパイル済みの数式を列全体に対して1回だけ評価
+        整数の負のべき乗・0除算・定義域外の値のように配列とスカラーで結果が変わりうる場合は
+        1行ずつの評価に戻す（エラーも1行ずつの場合と同じになる）
+        """
+        try:
+            with np.errstate(all="raise"):
+                return np.asarray(self.compiled.evaluate_array(data))
+        except Exception:
+            return super().convert_array(data)
 
 
 # 集約処理を行うConverter
@@ -117,12 +512,43 @@ class AggregationConverter(Converter):
             return min(values)
         else:
             raise ValueError(f"Unknown aggregation method: {self.method}")
+    
+    def bind(self, source_variables: List[str]) -> Callable[[Dict], Any]:
+        """集約方法を1回だけ解決した変換関数"""
+        if self.method not in ("sum", "avg", "max", "min"):
+            raise ValueError(f"Unknown aggregation method: {self.method}")
+        names = tuple(dict.fromkeys(source_variables))
+        if self.method == "avg":
+            return lambda source_data: sum([source_data[name] for name in names]) / len(names)
+        aggregate = {"sum": sum, "max": max, "min": min}[self.method]
+        return lambda source_data: aggregate([source_data[name] for name in names])
+    
+    def convert_array(self, data: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        列ごとに集約（組み込みの sum / max / min と同じ順序・比較で計算する）
+        """
+        values = list(data.values())
+        if self.method in ("sum", "avg"):
+            result = 0 + values[0]
+            for value in values[1:]:
+                result = result + value
+            return result / len(values) if self.method == "avg" else result
+        elif self.method in ("max", "min"):
+            result = values[0].copy()
+            for value in values[1:]:
+                # max() / min() は先頭から比較して「より大きい（小さい）」ときだけ置き換える
+                replace = value > result if self.method == "max" else value < result
+                result = np.where(replace, value, result)
+            return result
+        else:
+            raise ValueError(f"Unknown aggregation method: {self.method}")
 
 
 # Factory Method パターン: Converterオブジェクトを生成
 class ConverterFactory:
     def __init__(self):
         self._converters = {}
+        self.version = 0  # 登録内容が変わるたびに増える（コンパイル済み計画の無効化用）
         
         # デフォルトの変換ロジックを登録
         self.register_converter("simple", SimpleConverter)
@@ -133,6 +559,7 @@ class ConverterFactory:
     def register_converter(self, converter_type: str, converter_class: Type[Converter]):
         """新しい変換ロジッククラスを登録"""
         self._converters[converter_type] = converter_class
+        self.version += 1
     
     def create_converter(self, converter_type: str, params: Dict = None) -> Converter:
         """指定された型とパラメータで変換ロジックを生成"""
@@ -219,19 +646,214 @@ class MappingAdapter:
 class MappingManager:
     def __init__(self):
         self.mappings = []
+        self.version = 0  # マッピングが追加されるたびに増える（コンパイル済み計画の無効化用）
+        # 索引（追加順を保持）
+        self._by_pair: Dict[Tuple[str, str], List[Mapping]] = {}  # (source_code, target_code) -> マッピング
+        self._by_target: Dict[str, List[Mapping]] = {}  # target_variable -> マッピング
+        self._target_codes: Dict[str, Dict[str, None]] = {}  # source_code -> 直接変換できる target_code
+    
+    def _index(self, mapping: Mapping):
+        """マッピングを索引に登録"""
+        pair = (mapping.source_code, mapping.target_code)
+        self._by_pair.setdefault(pair, []).append(mapping)
+        self._by_target.setdefault(mapping.target_variable, []).append(mapping)
+        self._target_codes.setdefault(mapping.source_code, {})[mapping.target_code] = None
     
     def add_mapping(self, mapping: Mapping):
         """マッピングを追加"""
         self.mappings.append(mapping)
+        self._index(mapping)
+        self.version += 1
     
     def add_mappings(self, mappings: List[Mapping]):
         """複数のマッピングをまとめて追加"""
+        mappings = list(mappings)
         self.mappings.extend(mappings)
+        for mapping in mappings:
+            self._index(mapping)
+        self.version += 1
     
     def get_mappings(self, source_code: str, target_code: str) -> List[Mapping]:
         """指定したソースコードとターゲットコード間のマッピングを取得"""
-        return [m for m in self.mappings 
-                if m.source_code == source_code and m.target_code == target_code]
+        return list(self._by_pair.get((source_code, target_code), ()))
+    
+    def get_mappings_for_target(self, target_variable: str, target_code: str = None) -> List[Mapping]:
+        """指定した出力変数を作るマッピングを取得（target_code で絞り込み可）"""
+        mappings = self._by_target.get(target_variable, ())
+        if target_code is None:
+            return list(mappings)
+        return [m for m in mappings if m.target_code == target_code]
+    
+    def code_pairs(self) -> List[Tuple[str, str]]:
+        """マッピングが定義されている (source_code, target_code) の一覧"""
+        return list(self._by_pair)
+    
+    def find_route(self, source_code: str, target_code: str,
+                   check_variables: bool = True) -> Optional[List[str]]:
+        """
+        source_code から target_code への変換経路（コードの並び）を幅優先探索で求める
+        直接のマッピングがあれば [source_code, target_code]、経路がなければ None
+        同じ長さの経路が複数ある場合はマッピングの追加順で先に見つかるものを返す
+        多段の変換では前段の出力変数だけが次段に渡されるので、check_variables が True なら
+        2段目以降の各段の入力変数がすべて前段の出力変数に含まれる経路だけを探す
+        """
+        if source_code == target_code:
+            return [source_code]
+        # 次段で使える変数は直前の段で決まるので、探索の状態は最後にたどった (前のコード, コード)
+        start = (None, source_code)
+        previous = {start: None}
+        queue = deque([start])
+        while queue:
+            edge = queue.popleft()
+            prev_code, code = edge
+            available = None
+            if check_variables and prev_code is not None:
+                available = {m.target_variable for m in self._by_pair[(prev_code, code)]}
+            for next_code in self._target_codes.get(code, ()):
+                next_edge = (code, next_code)
+                if next_edge in previous:
+                    continue
+                if available is not None and any(
+                        name not in available
+                        for m in self._by_pair[next_edge] for name in m.source_variables):
+                    continue
+                previous[next_edge] = edge
+                if next_code == target_code:
+                    route = []
+                    while next_edge is not None:
+                        route.append(next_edge[1])
+                        next_edge = previous[next_edge]
+                    return route[::-1]
+                queue.append(next_edge)
+        return None
+
+
+# コンパイル済みの変換計画: マッピングの解決と Converter の生成は1回だけ行い、
+# レコードごとの変換では計算だけを行う
+class ConversionPlan:
+    def __init__(self, source_code: str, target_code: str, mappings: List[Mapping],
+                 converters: List[Converter]):
+        self.source_code = source_code
+        self.target_code = target_code
+        self.mappings = mappings
+        self.converters = converters
+        # (出力変数名, 入力変数名, 変換関数) の並び
+        self.steps: List[Tuple[str, Tuple[str, ...], Callable[[Dict], Any]]] = [
+            (mapping.target_variable, tuple(mapping.source_variables),
+             converter.bind(mapping.source_variables))
+            for mapping, converter in zip(mappings, converters)
+        ]
+        self.source_variables = tuple(dict.fromkeys(
+            name for mapping in mappings for name in mapping.source_variables))
+    
+    def convert(self, source_data: Dict) -> Dict:
+        """1レコードを変換"""
+        # bind() した変換関数は使う変数しか読まないので、マッピングに列挙された入力変数は先に全て確認する
+        for var_name in self.source_variables:
+            if var_name not in source_data:
+                raise ValueError(
+                    f"Source variable '{var_name}' not found in input data")
+        return {target_variable: convert(source_data) for target_variable, _, convert in self.steps}
+    
+    def convert_records(self, records: Iterable[Dict]) -> List[Dict]:
+        """複数レコードを変換"""
+        convert = self.convert
+        return [convert(record) for record in records]
+    
+    def convert_columns(self, columns):
+        """
+        列単位で一括変換
+        columns: DataFrame または 変数名 -> 配列 の辞書
+        戻り値: 入力が DataFrame なら DataFrame（同じ index）、辞書なら 変数名 -> 配列 の辞書
+        """
+        if isinstance(columns, pd.DataFrame):
+            result = self._convert_column_dict({name: columns[name].to_numpy() for name in columns.columns})
+            return pd.DataFrame(result, index=columns.index)
+        return self._convert_column_dict({name: np.asarray(values) for name, values in columns.items()})
+    
+    def _convert_column_dict(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """変数名 -> 配列 の辞書を変換"""
+        n_rows = len(next(iter(columns.values()))) if columns else 0
+        result = {}
+        for mapping, converter in zip(self.mappings, self.converters):
+            input_data = {}
+            for var_name in mapping.source_variables:
+                if var_name not in columns:
+                    raise ValueError(
+                        f"Source variable '{var_name}' not found in input data")
+                input_data[var_name] = columns[var_name]
+            # 定数の数式などスカラーの結果は行数に合わせる
+            values = _convert_array_exact(converter, input_data)
+            result[mapping.target_variable] = values if values.ndim else np.full(n_rows, values[()])
+        return result
+
+
+def _convert_array_exact(converter: Converter, data: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    converter.convert_array() で列単位に変換し、整数・真偽値の列でも1行ずつの convert() と同じ値にする
+    NumPy の固定長整数は桁あふれしても黙って折り返すので、整数列の結果は float64 で計算した値と
+    照合し、食い違う（桁あふれした）場合だけ Python の int を要素とする object 配列で計算し直す。
+    bool 同士の和は論理和になるため、真偽値の列を含む場合は最初から object 配列で計算する
+    """
+    kinds = {values.dtype.kind for values in data.values()}
+    if "b" not in kinds:
+        values = np.asarray(converter.convert_array(data))
+        if not kinds & {"i", "u"} or values.dtype.kind not in "biuf":
+            return values
+        shadow = np.asarray(converter.convert_array(
+            {name: column.astype(np.float64) if column.dtype.kind in "iu" else column
+             for name, column in data.items()}))
+        if shadow.shape == values.shape:
+            if values.dtype.kind == "b":
+                if np.array_equal(values, shadow):
+                    return values
+            else:
+                with np.errstate(all="ignore"):
+                    if np.allclose(values, shadow, rtol=1e-9, atol=0, equal_nan=True):
+                        return values
+    exact = {name: column.astype(object) if column.dtype.kind in "biu" else column
+             for name, column in data.items()}
+    return _infer_column(np.asarray(converter.convert_array(exact)))
+
+
+def _infer_column(values: np.ndarray) -> np.ndarray:
+    """
+    object 配列の結果を要素から推定した数値の dtype に戻す
+    int64 に収まらない整数や数値以外の要素を含む場合は object のまま
+    """
+    if values.dtype != object or values.ndim != 1:
+        return values
+    inferred = np.array(values.tolist())
+    return inferred if inferred.dtype.kind in "biuf" else values
+
+
+# 多段の変換計画: A -> B -> C のように各段の出力を次の段の入力として順に変換する
+class ChainedConversionPlan(ConversionPlan):
+    def __init__(self, stages: List[ConversionPlan]):
+        self.stages = stages
+        self.source_code = stages[0].source_code
+        self.target_code = stages[-1].target_code
+        self.mappings = stages[-1].mappings
+        self.converters = stages[-1].converters
+        self.steps = stages[-1].steps
+        self.source_variables = stages[0].source_variables
+    
+    @property
+    def route(self) -> List[str]:
+        """変換経路（コードの並び）"""
+        return [self.source_code] + [stage.target_code for stage in self.stages]
+    
+    def convert(self, source_data: Dict) -> Dict:
+        """1レコードを全段に通して変換（結果は最終段の出力変数のみ）"""
+        for stage in self.stages:
+            source_data = stage.convert(source_data)
+        return source_data
+    
+    def _convert_column_dict(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """列の辞書を全段に通して変換"""
+        for stage in self.stages:
+            columns = stage._convert_column_dict(columns)
+        return columns
 
 
 # Builder パターン: データ変換処理全体を構築
@@ -239,6 +861,7 @@ class DataConverter:
     def __init__(self):
         self.mapping_manager = MappingManager()
         self.converter_factory = ConverterFactory()
+        self._plans = {}  # (source_code, target_code) -> (マッピングの版, Factory の版, ConversionPlan)
     
     def load_mappings_from_file(self, file_path: str, file_format: str = None):
         """ファイルからマッピング定義を読み込む"""
@@ -269,6 +892,43 @@ class DataConverter:
         mappings = MappingAdapter.from_dict(mappings_dict)
         self.mapping_manager.add_mappings(mappings)
     
+    def compile(self, source_code: str, target_code: str) -> ConversionPlan:
+        """
+        変換計画を作成（マッピングの解決と Converter の生成を1回だけ行う）
+        同じコードの組み合わせの計画はキャッシュし、マッピングの追加や
+        Converter の登録があれば作り直す
+        """
+        key = (source_code, target_code)
+        versions = (self.mapping_manager.version, self.converter_factory.version)
+        cached = self._plans.get(key)
+        if cached is not None and cached[:2] == versions:
+            return cached[2]
+        
+        # 該当するマッピングを取得（直接のマッピングがなければ中間コードを経由する経路を探す）
+        mappings = self.mapping_manager.get_mappings(source_code, target_code)
+        if mappings:
+            plan = self._compile_stage(source_code, target_code, mappings)
+        else:
+            route = self.mapping_manager.find_route(source_code, target_code)
+            if route is None or len(route) < 2:
+                if self.mapping_manager.find_route(source_code, target_code, check_variables=False):
+                    raise ValueError(
+                        f"No conversion route for {source_code} -> {target_code}: every route has a "
+                        f"stage whose source variables are not produced by the previous stage")
+                raise ValueError(f"No mapping found for {source_code} -> {target_code}")
+            plan = ChainedConversionPlan([
+                self._compile_stage(src, tgt, self.mapping_manager.get_mappings(src, tgt))
+                for src, tgt in zip(route, route[1:])
+            ])
+        self._plans[key] = versions + (plan,)
+        return plan
+    
+    def _compile_stage(self, source_code: str, target_code: str, mappings: List[Mapping]) -> ConversionPlan:
+        """直接のマッピングから1段の変換計画を作成"""
+        converters = [self.converter_factory.create_converter(mapping.converter_type, mapping.params)
+                      for mapping in mappings]
+        return ConversionPlan(source_code, target_code, mappings, converters)
+    
     def convert(self, source_data: Dict, source_code: str, target_code: str) -> Dict:
         """
         ソースデータを変換
@@ -276,32 +936,167 @@ class DataConverter:
         source_code: 変換元コード識別子
         target_code: 変換先コード識別子
         """
-        # 該当するマッピングを取得
-        mappings = self.mapping_manager.get_mappings(source_code, target_code)
-        if not mappings:
-            raise ValueError(f"No mapping found for {source_code} -> {target_code}")
-        
-        # 変換結果を格納する辞書
-        result = {}
+        return self.compile(source_code, target_code).convert(source_data)
+    
+    def convert_columns(self, columns, source_code: str, target_code: str):
+        """
+        列単位でまとめて変換（結果は1行ずつの convert() と同じ）
+        ただし数式中のべき乗は NumPy の演算になるため、1行ずつの場合と最終桁が異なることがある
+        columns: DataFrame または 変数名 -> NumPy配列 の辞書
+        """
+        return self.compile(source_code, target_code).convert_columns(columns)
+    
+    def convert_file(self, input_path: str, output_path: str, source_code: str, target_code: str,
+                     chunk_size: int = 100000, workers: int = 1,
+                     input_format: str = None, output_format: str = None) -> int:
+        """
+        レコードファイルをチャンクごとに読み込み・変換・書き込みする（ストリーミング変換）
+        メモリ使用量はファイルの大きさによらずチャンクの大きさ（並列時は × 同時処理数）で決まる
+        input_path: 変換元ファイル（csv / text（空白区切り）/ parquet）
+        output_path: 変換先ファイル（csv / text / parquet）。parquet では整数の列も float64 で書く
+        workers: 並列処理のプロセス数（1 で逐次処理、None で CPU 数）。出力の順序は入力と同じ
+        戻り値: 変換したレコード数
+        """
+        plan = self.compile(source_code, target_code)
+        chunks = read_record_chunks(input_path, columns=list(plan.source_variables),
+                                    chunk_size=chunk_size, file_format=input_format)
         
-        # 各マッピングに従って変換処理を実行
-        for mapping in mappings:
-            # 入力変数の値を取得
-            input_data = {}
-            for var_name in mapping.source_variables:
-                if var_name not in source_data:
-                    raise ValueError(
-                        f"Source variable '{var_name}' not found in input data")
-                input_data[var_name] = source_data[var_name]
-            
-            # 変換ロジックを生成
-            converter = self.converter_factory.create_converter(
-                mapping.converter_type, mapping.params)
+        with RecordChunkWriter(output_path, output_format) as writer:
+            if workers == 1:
+                for chunk in chunks:
+                    writer.write(plan.convert_columns(chunk))
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+                workers = workers or os.cpu_count()
+                initargs = (list(self.mapping_manager.mappings), dict(self.converter_factory._converters),
+                            source_code, target_code)
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_conversion_worker,
+                                         initargs=initargs) as executor:
+                    # 同時に処理中のチャンク数を制限し、入力順に書き込む
+                    pending = deque()
+                    for chunk in chunks:
+                        pending.append(executor.submit(_convert_chunk, chunk))
+                        if len(pending) >= 2 * workers:
+                            writer.write(pending.popleft().result())
+                    while pending:
+                        writer.write(pending.popleft().result())
             
-            # 変換を実行
-            result[mapping.target_variable] = converter.convert(input_data)
-        
-        return result
+            # レコードがなくても見出しだけのファイルを作る
+            writer.write_header(pd.DataFrame({mapping.target_variable: np.empty(0) for mapping in plan.mappings}))
+            return writer.rows
+
+
+# ファイル入出力: チャンク単位で読み書きする（メモリ使用量はチャンクの大きさで決まる）
+_RECORD_FILE_FORMATS = {".csv": "csv", ".txt": "text", ".dat": "text", ".parquet": "parquet"}
+
+
+def _record_file_format(file_path: str, file_format: str = None) -> str:
+    """ファイル形式（csv / text / parquet）を決める"""
+    if file_format is None:
+        file_format = _RECORD_FILE_FORMATS.get(os.path.splitext(file_path)[1].lower())
+        if file_format is None:
+            raise ValueError("Unknown file format. Please specify explicitly.")
+    if file_format not in ("csv", "text", "parquet"):
+        raise ValueError(f"Unsupported file format: {file_format}")
+    return file_format
+
+
+def read_record_chunks(file_path: str, columns: List[str] = None, chunk_size: int = 100000,
+                       file_format: str = None) -> Iterator[pd.DataFrame]:
+    """
+    レコードファイルをチャンクごとの DataFrame として順に読み込む
+    columns を指定するとその列だけを読む（text は空白区切り）
+    """
+    file_format = _record_file_format(file_path, file_format)
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(file_path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+        return
+    
+    separator = "," if file_format == "csv" else r"\s+"
+    with pd.read_csv(file_path, sep=separator, usecols=columns, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+class RecordChunkWriter:
+    """変換結果をチャンクごとに追記するライター（csv / text / parquet）"""
+    
+    def __init__(self, file_path: str, file_format: str = None):
+        self.file_path = file_path
+        self.file_format = _record_file_format(file_path, file_format)
+        self.rows = 0
+        self._file = None
+        self._parquet_writer = None
+    
+    def write(self, frame: pd.DataFrame):
+        """1チャンクを書き込む（0行のチャンクは読み飛ばす）"""
+        if len(frame) == 0:
+            return
+        self._write(frame)
+        self.rows += len(frame)
+    
+    def write_header(self, frame: pd.DataFrame):
+        """まだ何も書き込んでいなければ frame の列だけ（0行）のファイルを作る"""
+        if self._file is None and self._parquet_writer is None:
+            self._write(frame.iloc[:0])
+    
+    def _write(self, frame: pd.DataFrame):
+        if self.file_format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            # read_csv はチャンクごとに dtype を推定するので、同じ列が整数のチャンクと小数のチャンクに
+            # 分かれうる。Parquet のスキーマは最初のチャンクで決まるため、整数の列は float64 で書く
+            frame = frame.astype({name: np.float64 for name, dtype in frame.dtypes.items()
+                                  if dtype.kind in "iu"})
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.file_path, table.schema)
+            else:
+                table = table.cast(self._parquet_writer.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            header = self._file is None
+            if header:
+                self._file = open(self.file_path, "w", newline="")
+            separator = "," if self.file_format == "csv" else " "
+            frame.to_csv(self._file, sep=separator, index=False, header=header)
+    
+    def close(self):
+        """ファイルを閉じる"""
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# 並列変換のワーカー: コンパイル済みの計画（コードオブジェクト）は pickle できないため、
+# マッピング定義と Converter の登録内容を受け取って各プロセスで計画を作り直す
+_worker_plan = None
+
+
+def _init_conversion_worker(mappings: List[Mapping], converter_types: Dict[str, Type[Converter]],
+                            source_code: str, target_code: str):
+    global _worker_plan
+    data_converter = DataConverter()
+    for converter_type, converter_class in converter_types.items():
+        data_converter.converter_factory.register_converter(converter_type, converter_class)
+    data_converter.mapping_manager.add_mappings(mappings)
+    _worker_plan = data_converter.compile(source_code, target_code)
+
+
+def _convert_chunk(frame: pd.DataFrame) -> pd.DataFrame:
+    return _worker_plan.convert_columns(frame)
 
 
 # 使用例
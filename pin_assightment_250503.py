@@ -10,18 +10,297 @@
 
 import math
 import csv
+import json
+import argparse
+import sys
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.patches import RegularPolygon
-from matplotlib.colors import Normalize
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Sequence
 import os
+import tempfile
+import warnings
+
+
+# 各辺の開始点（辺番号ごとの ring 倍の軸座標）と辺に沿った1ステップの変位
+_SIDE_START_Q = np.array([1, 1, 0, -1, -1, 0])
+_SIDE_START_R = np.array([0, -1, -1, 0, 1, 1])
+_SIDE_STEP_Q = np.array([0, -1, -1, 0, 1, 1])
+_SIDE_STEP_R = np.array([-1, 0, 1, 1, 0, -1])
+
+
+def hex_pin_count(rings):
+    """
+    リング数から六角格子のピン総数を計算（中心1本 + 各リング 6r 本 = 1 + 3R(R+1)）
+    
+    Args:
+        rings (int): リング数（中心ピンを除く）
+        
+    Returns:
+        int: ピン総数
+    """
+    rings = max(int(rings), 0)
+    return 1 + 3 * rings * (rings + 1)
+
+
+def rings_for_pin_count(total_pins):
+    """
+    ピン総数以上を収める最小のリング数（1 + 3R(R+1) >= total_pins の最小の R）
+    
+    Args:
+        total_pins (int): ピン総数
+        
+    Returns:
+        int: リング数
+    """
+    if total_pins <= 1:
+        return 0
+    # 2次方程式の解を整数平方根で求め、丸め誤差のないよう前後を確認する
+    rings = (math.isqrt(12 * total_pins - 3) - 3) // 6
+    while hex_pin_count(rings) < total_pins:
+        rings += 1
+    while rings > 0 and hex_pin_count(rings - 1) >= total_pins:
+        rings -= 1
+    return rings
+
+
+def hex_lattice_axial(rings):
+    """
+    六角格子の全ピンの軸座標を螺旋順に一括生成
+    
+    Args:
+        rings (int): リング数（中心ピンを除く）
+        
+    Returns:
+        tuple: (ring, position, q, r) の整数配列。中心ピンが先頭で、
+            以降はリングごとに辺0〜5の順に並ぶ
+    """
+    ring_numbers = np.arange(1, max(rings, 0) + 1)
+    counts = 6 * ring_numbers
+    
+    # 各ピンのリング番号とリング内位置
+    ring = np.repeat(ring_numbers, counts)
+    starts = np.cumsum(counts) - counts
+    position = np.arange(counts.sum()) - np.repeat(starts, counts)
+    
+    # リング内位置 → (辺, 辺上のステップ) → 軸座標
+    side = position // np.maximum(ring, 1)
+    step = position % np.maximum(ring, 1)
+    q = _SIDE_START_Q[side] * ring + _SIDE_STEP_Q[side] * step
+    r = _SIDE_START_R[side] * ring + _SIDE_STEP_R[side] * step
+    
+    # 中心ピンを先頭に追加
+    zero = np.zeros(1, dtype=np.int64)
+    return (np.concatenate([zero, ring]), np.concatenate([zero, position]),
+            np.concatenate([zero, q]), np.concatenate([zero, r]))
+
+
+def subchannel_ids_from_axial(q, r, rings):
+    """
+    軸座標からサブチャンネルID（上段左端から右へ、上から下へ、1始まり）を計算
+    
+    y座標は r に比例し、同じ行内の x座標は q に対して単調増加するため、
+    行 = r の降順、列 = q の昇順で番号が決まる（ソート不要）。
+    
+    Args:
+        q, r (numpy.ndarray): 軸座標
+        rings (int): リング数
+        
+    Returns:
+        numpy.ndarray: サブチャンネルID
+    """
+    q = np.asarray(q, dtype=np.int64)
+    r = np.asarray(r, dtype=np.int64)
+    
+    # 行 r のピン数は 2*rings + 1 - |r|。上の行（r = rings）から順に累積
+    row_r = np.arange(rings, -rings - 1, -1)
+    row_counts = 2 * rings + 1 - np.abs(row_r)
+    row_offsets = np.cumsum(row_counts) - row_counts
+    
+    # 行 r の左端の q は max(-rings, -rings - r)
+    q_min = np.maximum(-rings, -rings - r)
+    return 1 + row_offsets[rings - r] + (q - q_min)
+
+
+# 軸座標で隣接する6方向（辺0〜5の開始方向と同じ順）
+NEIGHBOR_DIRECTIONS = np.array([(1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1)])
+
+
+class LatticeTemplate:
+    """(リング数, ピッチ) ごとの不変な格子テンプレート（配列はすべて読み取り専用）"""
+    
+    FIELDS = ('ring', 'position', 'q', 'r', 'x', 'y', 'spiral_id', 'subchannel_id', 'neighbors', 'triangles')
+    CACHE_VERSION = 2  # FIELDS を変更したら上げる（古いディスクキャッシュを読まないため）
+    
+    def __init__(self, rings, pitch, **arrays):
+        """
+        Args:
+            rings (int): リング数
+            pitch (float): ピン間距離（ピッチ）
+            **arrays: FIELDS の各配列（ピンは生成順 = 螺旋順）
+        """
+        self.rings = rings
+        self.pitch = pitch
+        for name in self.FIELDS:
+            array = np.array(arrays[name])
+            array.setflags(write=False)
+            setattr(self, name, array)
+    
+    def __len__(self):
+        return len(self.ring)
+    
+    @property
+    def geometric_y(self):
+        """
+        ピッチ倍の y 座標（pitch * √3/2 * r）
+        
+        y は HexagonalGrid の出力互換のため従来式（pitch の2乗を含む）のままなので、
+        pitch ≠ 1 のときは隣接ピン間距離が pitch にならない。炉心配置のように
+        実寸の幾何が必要な場合はこちらを使う。
+        """
+        return self.pitch * (math.sqrt(3) / 2) * self.r
+    
+    @classmethod
+    def build(cls, rings, pitch):
+        """格子を生成してテンプレートを作成"""
+        ring, position, q, r = hex_lattice_axial(rings)
+        
+        # x, y座標に変換（HexagonalGrid.generate_pins と同じ式）
+        x = pitch * (q + r/2)
+        y = pitch * (math.sqrt(3)/2) * pitch * r
+        
+        # 螺旋ID: リング番号、リング内位置の順
+        spiral_id = np.empty(len(q), dtype=np.int64)
+        spiral_id[np.lexsort((position, ring))] = np.arange(len(q))
+        
+        # サブチャンネルID: 上段左端から右へ、上から下へ
+        subchannel_id = subchannel_ids_from_axial(q, r, rings)
+        
+        # 隣接ピン表（範囲外は -1）。1周余分に取った軸座標索引で引く
+        size = 2 * rings + 3
+        axial_index = np.full((size, size), -1, dtype=np.int64)
+        axial_index[q + rings + 1, r + rings + 1] = np.arange(len(q))
+        neighbors = axial_index[q[:, np.newaxis] + NEIGHBOR_DIRECTIONS[:, 0] + rings + 1,
+                                r[:, np.newaxis] + NEIGHBOR_DIRECTIONS[:, 1] + rings + 1]
+        
+        # 三角形サブチャンネル（3ピン）。各三角形を左端のピンから一度だけ数える
+        #   上向き: i, i+(1,0), i+(0,1)　下向き: i, i+(1,0), i+(1,-1)
+        own = np.arange(len(q))
+        triangles = np.concatenate([
+            np.column_stack((own, neighbors[:, 0], neighbors[:, 5])),
+            np.column_stack((own, neighbors[:, 0], neighbors[:, 1])),
+        ])
+        triangles = triangles[(triangles >= 0).all(axis=1)]
+        
+        return cls(rings, pitch, ring=ring, position=position, q=q, r=r, x=x, y=y,
+                   spiral_id=spiral_id, subchannel_id=subchannel_id, neighbors=neighbors,
+                   triangles=triangles)
+    
+    @staticmethod
+    def cache_path(cache_dir, rings, pitch):
+        """ディスクキャッシュのファイルパス"""
+        return os.path.join(cache_dir, f"lattice_v{LatticeTemplate.CACHE_VERSION}_{rings}_{pitch!r}.npz")
+    
+    def save(self, filename):
+        """
+        テンプレートを .npz に保存
+        
+        同じディレクトリの一時ファイルに書き出してから os.replace で置き換えるので、
+        並行して読み込むプロセスが書きかけのファイルを見ることはない。
+        """
+        directory = os.path.dirname(os.path.abspath(filename))
+        fd, tmp_path = tempfile.mkstemp(prefix='.lattice_', suffix='.npz.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, rings=self.rings, pitch=self.pitch,
+                         **{name: getattr(self, name) for name in self.FIELDS})
+            os.replace(tmp_path, filename)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    
+    @classmethod
+    def load(cls, filename):
+        """.npz からテンプレートを読み込み"""
+        with np.load(filename) as data:
+            return cls(int(data['rings']), float(data['pitch']),
+                       **{name: data[name] for name in cls.FIELDS})
+
+
+# プロセス全体の格子テンプレートキャッシュ（LRU）
+_lattice_cache = OrderedDict()
+_lattice_cache_size = 64
+_lattice_cache_dir = None
+
+
+def configure_lattice_cache(max_size=None, cache_dir=None):
+    """
+    格子テンプレートキャッシュの設定
+    
+    Args:
+        max_size (int, optional): メモリ上に保持するテンプレート数の上限
+        cache_dir (str, optional): ディスクキャッシュのディレクトリ（'' で無効化）
+    """
+    global _lattice_cache_size, _lattice_cache_dir
+    if max_size is not None:
+        _lattice_cache_size = max_size
+        while len(_lattice_cache) > _lattice_cache_size:
+            _lattice_cache.popitem(last=False)
+    if cache_dir is not None:
+        _lattice_cache_dir = cache_dir or None
+        if _lattice_cache_dir:
+            os.makedirs(_lattice_cache_dir, exist_ok=True)
+
+
+def clear_lattice_cache():
+    """メモリ上の格子テンプレートキャッシュを消去"""
+    _lattice_cache.clear()
+
+
+def get_lattice_template(rings, pitch):
+    """
+    (リング数, ピッチ) の格子テンプレートを取得（キャッシュがあれば再利用）
+    
+    Args:
+        rings (int): リング数
+        pitch (float): ピン間距離（ピッチ）
+        
+    Returns:
+        LatticeTemplate: 読み取り専用の格子テンプレート
+    """
+    key = (int(rings), float(pitch))
+    template = _lattice_cache.get(key)
+    if template is not None:
+        _lattice_cache.move_to_end(key)
+        return template
+    
+    path = LatticeTemplate.cache_path(_lattice_cache_dir, *key) if _lattice_cache_dir else None
+    if path and os.path.exists(path):
+        template = LatticeTemplate.load(path)
+    else:
+        template = LatticeTemplate.build(*key)
+        if path:
+            template.save(path)
+    
+    _lattice_cache[key] = template
+    while len(_lattice_cache) > _lattice_cache_size:
+        _lattice_cache.popitem(last=False)
+    return template
 
 
 class Pin:
     """ピンを表すクラス"""
     
+    __slots__ = ('id', 'ring', 'position', 'coordinates', 'value', 'subchannel_id', 'axial')
+    
     def __init__(self, ring=None, position=None, coordinates=None):
         self.id = None  # ピン番号（螺旋状）
         self.ring = ring  # リング番号
@@ -29,26 +308,227 @@ class Pin:
         self.coordinates = coordinates  # (x, y)座標
         self.value = None  # 割り当て値
         self.subchannel_id = None  # サブチャンネル方式のID
+        self.axial = None  # 六角格子の軸座標 (q, r)
+        
+    def __str__(self):
+        return f"Pin(id={self.id}, ring={self.ring}, pos={self.position}, coord={self.coordinates}, value={self.value}, subchannel_id={self.subchannel_id})"
+
+
+class PinArrays:
+    """ピンデータを列ごとの連続配列で保持するクラス（列指向モード用）"""
+    
+    __slots__ = ('ring', 'q', 'r', 'x', 'y', 'position', 'spiral_id', 'subchannel_id', 'value')
+    
+    def __init__(self, ring, q, r, x, y, position):
+        """
+        列配列の初期化
         
+        Args:
+            ring, q, r, x, y, position (array-like): 各ピンの幾何情報
+                （読み取り専用の配列はコピーせずそのまま共有する）
+        """
+        self.ring = np.ascontiguousarray(ring, dtype=np.int64)
+        self.q = np.ascontiguousarray(q, dtype=np.int64)
+        self.r = np.ascontiguousarray(r, dtype=np.int64)
+        self.x = np.ascontiguousarray(x, dtype=np.float64)
+        self.y = np.ascontiguousarray(y, dtype=np.float64)
+        self.position = np.array(position, dtype=np.int64)  # 未設定は -1（書き換え可能なコピー）
+        n = len(self.ring)
+        self.spiral_id = np.full(n, -1, dtype=np.int64)  # 未割り当ては -1
+        self.subchannel_id = np.full(n, -1, dtype=np.int64)  # 未割り当ては -1
+        self.value = np.full(n, np.nan)  # 未割り当ては NaN（軸方向分布は2次元）
+    
+    def __len__(self):
+        return len(self.ring)
+
+
+class PinView:
+    """列配列上の1ピンを Pin と同じ属性名で参照する軽量ビュー"""
+    
+    __slots__ = ('_arrays', '_index')
+    
+    def __init__(self, arrays, index):
+        self._arrays = arrays
+        self._index = index
+    
+    @staticmethod
+    def _optional_id(value):
+        return None if value < 0 else int(value)
+    
+    @property
+    def id(self):
+        return self._optional_id(self._arrays.spiral_id[self._index])
+    
+    @id.setter
+    def id(self, value):
+        self._arrays.spiral_id[self._index] = -1 if value is None else value
+    
+    @property
+    def subchannel_id(self):
+        return self._optional_id(self._arrays.subchannel_id[self._index])
+    
+    @subchannel_id.setter
+    def subchannel_id(self, value):
+        self._arrays.subchannel_id[self._index] = -1 if value is None else value
+    
+    @property
+    def ring(self):
+        return int(self._arrays.ring[self._index])
+    
+    @property
+    def position(self):
+        return self._optional_id(self._arrays.position[self._index])
+    
+    @position.setter
+    def position(self, value):
+        self._arrays.position[self._index] = -1 if value is None else value
+    
+    @property
+    def coordinates(self):
+        return (float(self._arrays.x[self._index]), float(self._arrays.y[self._index]))
+    
+    @property
+    def axial(self):
+        return (int(self._arrays.q[self._index]), int(self._arrays.r[self._index]))
+    
+    @property
+    def value(self):
+        value = self._arrays.value[self._index]
+        if self._arrays.value.ndim > 1:
+            return value
+        return None if np.isnan(value) else float(value)
+    
+    @value.setter
+    def value(self, value):
+        arrays = self._arrays
+        if value is None:
+            arrays.value[self._index] = np.nan
+            return
+        if np.ndim(value) == 1 and arrays.value.ndim == 1:
+            # 軸方向分布が初めて設定された場合は (ピン数, 軸方向点数) に拡張
+            arrays.value = np.full((len(arrays), len(value)), np.nan)
+        arrays.value[self._index] = value
+    
     def __str__(self):
         return f"Pin(id={self.id}, ring={self.ring}, pos={self.position}, coord={self.coordinates}, value={self.value}, subchannel_id={self.subchannel_id})"
 
 
-class HexagonalGrid:
+class PinList(Sequence):
+    """列配列を Pin のリストとして見せるシーケンス"""
+    
+    def __init__(self, arrays):
+        self.arrays = arrays
+    
+    def __len__(self):
+        return len(self.arrays)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [PinView(self.arrays, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ピンインデックスが範囲外です")
+        return PinView(self.arrays, index)
+    
+    def __iter__(self):
+        arrays = self.arrays
+        return (PinView(arrays, i) for i in range(len(arrays)))
+
+
+class PinOrdering:
+    """螺旋ID順とサブチャンネルID順の間で配列を並べ替える機能（column() を持つ格子用）"""
+    
+    _id_permutations = None
+    
+    def id_permutations(self):
+        """
+        螺旋IDとサブチャンネルIDの相互変換用の置換配列を取得（IDが変わるまでキャッシュ）
+        
+        Returns:
+            tuple: (spiral_to_subchannel, subchannel_to_spiral)
+                spiral_to_subchannel[螺旋ID] = サブチャンネルID、
+                subchannel_to_spiral[サブチャンネルID - 1] = 螺旋ID
+        """
+        if self._id_permutations is None:
+            spiral_ids = self.column('spiral_id')
+            subchannel_ids = self.column('subchannel_id')
+            if (spiral_ids < 0).any() or (subchannel_ids < 0).any():
+                raise ValueError("螺旋IDとサブチャンネルIDの両方を割り当ててください")
+            
+            spiral_to_subchannel = np.empty(len(spiral_ids), dtype=np.int64)
+            spiral_to_subchannel[spiral_ids] = subchannel_ids
+            subchannel_to_spiral = np.empty(len(spiral_ids), dtype=np.int64)
+            subchannel_to_spiral[subchannel_ids - 1] = spiral_ids
+            
+            # 並べ替え用の0始まりインデックスも合わせて保持
+            self._gather_to_spiral = spiral_to_subchannel - 1
+            for permutation in (spiral_to_subchannel, subchannel_to_spiral, self._gather_to_spiral):
+                permutation.setflags(write=False)
+            self._id_permutations = (spiral_to_subchannel, subchannel_to_spiral)
+        return self._id_permutations
+    
+    def to_subchannel_order(self, values, axis=0, out=None):
+        """
+        螺旋ID順の配列をサブチャンネルID順に並べ替え
+        
+        Args:
+            values (array-like): 螺旋ID順のピンデータ（ピン × 軸方向 × 時刻 など任意次元）
+            axis (int): ピン方向の軸
+            out (numpy.ndarray, optional): 出力先
+            
+        Returns:
+            numpy.ndarray: サブチャンネルID順のピンデータ
+        """
+        _, subchannel_to_spiral = self.id_permutations()
+        return np.take(values, subchannel_to_spiral, axis=axis, out=out)
+    
+    def to_spiral_order(self, values, axis=0, out=None):
+        """
+        サブチャンネルID順の配列を螺旋ID順に並べ替え
+        
+        Args:
+            values (array-like): サブチャンネルID順のピンデータ（任意次元）
+            axis (int): ピン方向の軸
+            out (numpy.ndarray, optional): 出力先
+            
+        Returns:
+            numpy.ndarray: 螺旋ID順のピンデータ
+        """
+        self.id_permutations()
+        return np.take(values, self._gather_to_spiral, axis=axis, out=out)
+
+
+class HexagonalGrid(PinOrdering):
     """六角格子を表すクラス"""
     
-    def __init__(self, rings, pitch):
+    def __init__(self, rings, pitch, columnar=False):
         """
         六角格子の初期化
         
         Args:
             rings (int): リング数
             pitch (float): ピン間距離（ピッチ）
+            columnar (bool): Trueの場合はピンを列配列（PinArrays）で保持し、
+                pins は PinView のシーケンスになる
         """
         self.rings = rings
         self.pitch = pitch
+        self.columnar = columnar
         self.pins = []
-        self.total_pins = sum(1 + 6 * i for i in range(rings))
+        # 列配列（generate_pins で作成）。通常モードでは幾何情報の列のみ有効で、
+        # ID・値は Pin オブジェクト側が正となる（column() で取得）
+        self.arrays = None
+        self.template = None  # 格子テンプレート（generate_pins で取得）
+        self.total_pins = hex_pin_count(rings)
+        
+        # ピンインデックスの索引（密な配列、未登録は -1）
+        self._spiral_index = None  # 螺旋ID → ピンインデックス
+        self._subchannel_index = None  # サブチャンネルID → ピンインデックス
+        self._spiral_index_count = -1  # 索引作成時のピン数（ピン数が変われば索引は古い）
+        self._subchannel_index_count = -1
+        self._axial_index = None  # 軸座標 (q + rings, r + rings) → ピンインデックス
+        self._id_permutations = None  # 螺旋ID ⇔ サブチャンネルID の置換配列
         
     # def generate_pins(self):
     #     """中心から螺旋状にピンを生成する"""
@@ -72,235 +552,1483 @@ class HexagonalGrid:
     #             pin = Pin(ring=ring, position=pos, coordinates=(x, y))
     #             self.pins.append(pin)
     def generate_pins(self):
-        # 中心ピン
-        center_pin = Pin(ring=0, position=0, coordinates=(0, 0))
-        self.pins.append(center_pin)
-
-        # 周辺リング
-        for ring in range(1, self.rings+1):  # 1からself.ringsまで
-            for side in range(6):  # 6辺
-                for step in range(ring):
-                    # 六角格子の軸座標
-                    # 各辺の開始点
-                    if side == 0:
-                        q, r_ = ring, -step
-                    elif side == 1:
-                        q, r_ = ring-step, -ring
-                    elif side == 2:
-                        q, r_ = -step, -ring+step
-                    elif side == 3:
-                        q, r_ = -ring, step
-                    elif side == 4:
-                        q, r_ = -ring+step, ring
-                    elif side == 5:
-                        q, r_ = step, ring-step
-
-                    # x, y座標に変換
-                    x = self.pitch * (q + r_/2)
-                    y = self.pitch * (math.sqrt(3)/2) * self.pitch * r_
-                    pin = Pin(ring=ring, position=None, coordinates=(x, y))
-                    self.pins.append(pin)
+        """中心から螺旋状にピンを生成する（軸座標を一括計算）"""
+        # 同じ (リング数, ピッチ) の格子はキャッシュ済みテンプレートを共有する
+        self.template = get_lattice_template(self.rings, self.pitch)
+        t = self.template
+
+        self.arrays = PinArrays(t.ring, t.q, t.r, t.x, t.y, t.position)
+        if len(self.arrays) != self.total_pins:
+            raise RuntimeError(f"生成したピン数 {len(self.arrays)} がリング数 {self.rings} の"
+                               f"ピン総数 {self.total_pins} と一致しません")
+        self._build_pins()
+        self._build_axial_index()
+
+    def _build_pins(self):
+        """列配列から pins を作成（列指向モードではビュー、通常モードでは Pin オブジェクト）"""
+        arrays = self.arrays
+        if self.columnar:
+            self.pins = PinList(arrays)
+            return
+        
+        self.pins = []
+        for i in range(len(arrays)):
+            if i == 0:
+                # 中心ピンは従来どおり整数座標
+                pin = Pin(ring=0, position=0, coordinates=(0, 0))
+            else:
+                pin = Pin(ring=int(arrays.ring[i]), position=int(arrays.position[i]),
+                          coordinates=(float(arrays.x[i]), float(arrays.y[i])))
+            pin.axial = (int(arrays.q[i]), int(arrays.r[i]))
+            self.pins.append(pin)
+
+    def _matches_template(self):
+        """ピン配置がテンプレートのまま（リング内位置が未変更）かどうか"""
+        return (self.template is not None and self.arrays is not None
+                and np.array_equal(self.arrays.position, self.template.position))
+
+    def column(self, name):
+        """
+        ピンデータの列を配列で取得
+        
+        Args:
+            name (str): 'ring', 'q', 'r', 'x', 'y', 'position', 'spiral_id', 'subchannel_id', 'value'
+            
+        Returns:
+            numpy.ndarray: 列配列（列指向モードでは内部配列そのもの）
+        """
+        if self.columnar or name in ('ring', 'q', 'r', 'x', 'y'):
+            return getattr(self.arrays, name)
+        
+        # 通常モードでは Pin オブジェクトから集める（未割り当ては -1 / NaN）
+        if name == 'value':
+            return np.array([np.nan if pin.value is None else pin.value for pin in self.pins], dtype=np.float64)
+        attr = 'id' if name == 'spiral_id' else name
+        return np.array([-1 if getattr(pin, attr) is None else getattr(pin, attr) for pin in self.pins],
+                        dtype=np.int64)
 
     def assign_spiral_ids(self):
         """螺旋状にIDを割り当て"""
+        if self.columnar and self._matches_template():
+            np.copyto(self.arrays.spiral_id, self.template.spiral_id)
+            self._build_spiral_index()
+            return
+        if self.columnar:
+            # リング番号、リング内位置の順に安定ソート
+            order = np.lexsort((self.arrays.position, self.arrays.ring))
+            self.arrays.spiral_id[order] = np.arange(len(order))
+            self._build_spiral_index()
+            return
+        
         # ピンを中心から外側へ、各リング内は角度順に並べ替え
         sorted_pins = sorted(self.pins, key=lambda p: (p.ring, p.position))
         
         # 螺旋状に番号を割り当て
         for i, pin in enumerate(sorted_pins):
             pin.id = i
+        
+        self._build_spiral_index()
     
     def convert_to_subchannel_ids(self):
         """サブチャンネル方式（上段左端から右へ、上から下へ）に変換"""
-        # 各ピンのy座標でグループ化して行を特定
-        pins_by_y = {}
-        for pin in self.pins:
-            # 浮動小数点の誤差を避けるため、小数点以下の桁を丸める
-            y_rounded = round(pin.coordinates[1], 6)
-            if y_rounded not in pins_by_y:
-                pins_by_y[y_rounded] = []
-            pins_by_y[y_rounded].append(pin)
-        
-        # y座標の値で降順にソート（上から下へ）
-        sorted_y_values = sorted(pins_by_y.keys(), reverse=True)
-        
-        # 各行内でx座標でソート（左から右へ）
-        subchannel_id = 1
-        for y in sorted_y_values:
-            row_pins = pins_by_y[y]
-            # x座標でソート
-            row_pins.sort(key=lambda p: p.coordinates[0])
-            
-            # サブチャンネルIDを割り当て
-            for pin in row_pins:
+        # 規則格子なので、行 = r（上から下へ）、行内の列 = q（左から右へ）で解析的に決まる
+        subchannel_ids = subchannel_ids_from_axial(self.arrays.q, self.arrays.r, self.rings)
+        
+        if self.columnar:
+            np.copyto(self.arrays.subchannel_id, subchannel_ids)
+        else:
+            for pin, subchannel_id in zip(self.pins, subchannel_ids.tolist()):
                 pin.subchannel_id = subchannel_id
-                subchannel_id += 1
+        
+        self._build_subchannel_index()
+    
+    @staticmethod
+    def _build_id_index(ids):
+        """
+        ID配列からピンインデックスへの密な索引を作成
+        
+        Args:
+            ids (numpy.ndarray): 各ピンのID（未割り当ては -1）
+            
+        Returns:
+            numpy.ndarray: ID → ピンインデックスの配列（該当なしは -1）
+        """
+        assigned = np.flatnonzero(ids >= 0)
+        if len(assigned) == 0:
+            return np.full(0, -1, dtype=np.int64)
+        
+        index = np.full(ids[assigned].max() + 1, -1, dtype=np.int64)
+        index[ids[assigned]] = assigned
+        return index
+    
+    def _build_spiral_index(self):
+        """螺旋IDの索引を作成"""
+        self._id_permutations = None
+        self._spiral_index = self._build_id_index(self.column('spiral_id'))
+        self._spiral_index_count = len(self.pins)
+    
+    def _build_subchannel_index(self):
+        """サブチャンネルIDの索引を作成"""
+        self._id_permutations = None
+        self._subchannel_index = self._build_id_index(self.column('subchannel_id'))
+        self._subchannel_index_count = len(self.pins)
+    
+    def _build_axial_index(self):
+        """軸座標の索引を作成"""
+        size = 2 * self.rings + 1
+        self._axial_index = np.full((size, size), -1, dtype=np.int64)
+        if self.arrays is not None:
+            self._axial_index[self.arrays.q + self.rings, self.arrays.r + self.rings] = np.arange(len(self.arrays))
+    
+    def rebuild_indexes(self):
+        """ピンのIDや軸座標を直接変更した後に索引を作り直す"""
+        self._build_axial_index()
+        self._build_spiral_index()
+        self._build_subchannel_index()
+    
+    @staticmethod
+    def _lookup(index, key):
+        """索引からピンインデックスを取得（該当なしは -1）"""
+        if index is None or key is None or key < 0 or key >= len(index):
+            return -1
+        return int(index[key])
+    
+    def _index_is_stale(self, i, key, attr, indexed_count):
+        """
+        索引の検索結果が古い索引によるものかどうか
+        
+        該当なしの場合はピン数が索引作成時から変わったときだけ古いとみなす
+        （存在しないIDの検索で毎回索引を作り直さないため）。ピンのIDを直接
+        書き換えた場合は rebuild_indexes() を呼ぶ。
+        """
+        if indexed_count != len(self.pins):
+            return True
+        return 0 <= i and (i >= len(self.pins) or getattr(self.pins[i], attr) != key)
     
     def get_pin_by_spiral_id(self, spiral_id):
         """螺旋IDからピンを取得"""
-        for pin in self.pins:
-            if pin.id == spiral_id:
-                return pin
-        return None
+        i = self._lookup(self._spiral_index, spiral_id)
+        if self._index_is_stale(i, spiral_id, 'id', self._spiral_index_count):
+            # 索引が古い場合は作り直して再検索
+            self._build_spiral_index()
+            i = self._lookup(self._spiral_index, spiral_id)
+        return self.pins[i] if i >= 0 else None
     
     def get_pin_by_subchannel_id(self, subchannel_id):
         """サブチャンネルIDからピンを取得"""
-        for pin in self.pins:
-            if pin.subchannel_id == subchannel_id:
-                return pin
-        return None
-
-
-class InterpolationStrategy(ABC):
-    """補間方法の基底クラス"""
+        i = self._lookup(self._subchannel_index, subchannel_id)
+        if self._index_is_stale(i, subchannel_id, 'subchannel_id', self._subchannel_index_count):
+            # 索引が古い場合は作り直して再検索
+            self._build_subchannel_index()
+            i = self._lookup(self._subchannel_index, subchannel_id)
+        return self.pins[i] if i >= 0 else None
     
-    @abstractmethod
-    def interpolate(self, pins, input_values):
+    def get_pin_by_axial(self, q, r):
+        """軸座標 (q, r) からピンを取得"""
+        if self._axial_index is None or max(abs(q), abs(r), abs(q + r)) > self.rings:
+            return None
+        i = int(self._axial_index[q + self.rings, r + self.rings])
+        return self.pins[i] if i >= 0 else None
+    
+    def get_pin_indices_by_spiral_ids(self, spiral_ids):
         """
-        各ピンに値を割り当てる
+        複数の螺旋IDからピンインデックスを一括取得
         
         Args:
-            pins (list): Pinオブジェクトのリスト
-            input_values (dict): 補間に必要な入力値
+            spiral_ids (array-like): 螺旋IDの並び
+            
+        Returns:
+            numpy.ndarray: ピンインデックスの配列（該当なしは -1）
         """
-        pass
-
-
-class ThreePointInterpolation(InterpolationStrategy):
-    """3点補間による値の割り当て"""
+        if self._spiral_index is None or self._spiral_index_count != len(self.pins):
+            self._build_spiral_index()
+        ids = np.asarray(spiral_ids, dtype=np.int64)
+        valid = (ids >= 0) & (ids < len(self._spiral_index))
+        indices = np.full(ids.shape, -1, dtype=np.int64)
+        indices[valid] = self._spiral_index[ids[valid]]
+        return indices
     
-    def interpolate(self, pins, input_values):
+    # ---- 隣接関係（ピンの並びは pins と同じ生成順） ----
+    
+    def _require_template(self):
+        """隣接表を使う前に格子が生成済みか確認"""
+        if self.template is None:
+            raise ValueError("先に generate_pins() で格子を生成してください")
+        return self.template
+    
+    def neighbor_table(self):
         """
-        中心ピーク値、外側ピーク値、外側最小値による3点補間
+        隣接ピンの CSR 形式の表
         
-        Args:
-            pins (list): Pinオブジェクトのリスト
-            input_values (dict): {
-                'center_peak': float, # 中心ピークの値
-                'outer_peak': float,  # 外側ピークの値
-                'outer_min': float    # 外側最小値
-            }
+        Returns:
+            tuple: (indptr, indices)。ピン i の隣接ピンは indices[indptr[i]:indptr[i+1]]
+                   （NEIGHBOR_DIRECTIONS の方向順、格子外は除く）
         """
-        center_peak = input_values.get('center_peak', 100.0)
-        outer_peak = input_values.get('outer_peak', 80.0)
-        outer_min = input_values.get('outer_min', 60.0)
-        
-        max_ring = max(pin.ring for pin in pins)
-        
-        for pin in pins:
-            # 中心ピン
-            if pin.ring == 0:
-                pin.value = center_peak
-            else:
-                # 外側ピンは角度に応じて値を変える
-                # 0度方向（基準方向）でピーク値、180度方向で最小値
-                angle = math.atan2(pin.coordinates[1], pin.coordinates[0])
-                # -π〜πの範囲を0〜2πに変換
-                if angle < 0:
-                    angle += 2 * math.pi
-                
-                # リングごとの重み（中心からの距離に応じた補間）
-                ring_ratio = pin.ring / max_ring
-                
-                # 角度に応じた値の変化（コサイン関数で滑らかに変化）
-                angle_factor = (1 + math.cos(angle)) / 2  # 0〜1の範囲
-                
-                # 最終的な値の計算
-                value_range = outer_peak - outer_min
-                pin.value = outer_min + value_range * angle_factor
-                
-                # 中心からの値の変化を反映（線形補間）
-                center_to_outer_diff = pin.value - center_peak
-                pin.value = center_peak + center_to_outer_diff * ring_ratio
-
-
-class SevenPointInterpolation(InterpolationStrategy):
-    """7点補間による値の割り当て"""
+        neighbors = self._require_template().neighbors
+        valid = neighbors >= 0
+        indptr = np.zeros(len(neighbors) + 1, dtype=np.int64)
+        np.cumsum(valid.sum(axis=1), out=indptr[1:])
+        return indptr, neighbors[valid]
     
-    def interpolate(self, pins, input_values):
+    def subchannel_pins(self):
         """
-        中心ピーク値と六角頂点位置のピーク値（6点）による7点補間
+        三角形サブチャンネルを構成するピン
         
-        Args:
-            pins (list): Pinオブジェクトのリスト
-            input_values (dict): {
-                'center_peak': float,    # 中心ピークの値
-                'vertex_values': list    # 六角形の頂点位置の値（6点）
-            }
+        Returns:
+            numpy.ndarray: (サブチャンネル数, 3) のピンインデックス配列
         """
-        center_peak = input_values.get('center_peak', 100.0)
-        vertex_values = input_values.get('vertex_values', [80.0] * 6)
-        
-        # 頂点値が6つでない場合は調整
-        if len(vertex_values) < 6:
-            vertex_values.extend([80.0] * (6 - len(vertex_values)))
-        elif len(vertex_values) > 6:
-            vertex_values = vertex_values[:6]
-        
-        max_ring = max(pin.ring for pin in pins)
+        return self._require_template().triangles
+    
+    def pin_subchannel_table(self):
+        """
+        ピン → 周囲の三角形サブチャンネルの CSR 形式の表
         
-        for pin in pins:
-            # 中心ピン
-            if pin.ring == 0:
-                pin.value = center_peak
-            else:
-                # 六角形の60度ごとの頂点方向（0, 60, 120, 180, 240, 300度）
-                angle = math.atan2(pin.coordinates[1], pin.coordinates[0])
-                # -π〜πの範囲を0〜2πに変換
-                if angle < 0:
-                    angle += 2 * math.pi
-                
-                # 角度を0〜360度に変換
-                angle_deg = math.degrees(angle)
-                
-                # 最も近い2つの頂点を特定
-                sector = int(angle_deg / 60)
-                next_sector = (sector + 1) % 6
-                
-                # 2つの頂点間での角度の位置（0〜1）
-                sector_pos = (angle_deg - sector * 60) / 60
-                
-                # 2点間の値を線形補間
-                interpolated_value = vertex_values[sector] * (1 - sector_pos) + vertex_values[next_sector] * sector_pos
-                
-                # リングごとの重み（中心からの距離に応じた補間）
-                ring_ratio = pin.ring / max_ring
-                
-                # 中心から頂点への値の変化を反映（線形補間）
-                center_to_vertex_diff = interpolated_value - center_peak
-                pin.value = center_peak + center_to_vertex_diff * ring_ratio
-
-
-class OutputBuilder(ABC):
-    """出力形式の基底クラス"""
+        Returns:
+            tuple: (indptr, indices)。ピン i に接するサブチャンネルは indices[indptr[i]:indptr[i+1]]
+        """
+        triangles = self.subchannel_pins()
+        pins = triangles.ravel()
+        order = np.argsort(pins, kind='stable')
+        indptr = np.zeros(len(self.pins) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pins, minlength=len(self.pins)), out=indptr[1:])
+        return indptr, order // 3
     
-    def __init__(self):
-        self.output = None
+    def _stencil_values(self, values):
+        """ステンシル計算の入力（省略時は各ピンの値）を (ピン数, ...) の配列に"""
+        if values is None:
+            values = self.column('value')
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) != len(self.pins):
+            raise ValueError(f"値の数 {len(values)} がピン数 {len(self.pins)} と一致しません")
+        return values
     
-    @abstractmethod
-    def build_data(self, pins):
+    def _gather_neighbors(self, values):
+        """隣接ピンの値を (ピン数, 6, ...) に集める（格子外は 0）と有効マスク"""
+        neighbors = self._require_template().neighbors
+        valid = neighbors >= 0
+        gathered = values[np.where(valid, neighbors, 0)]
+        mask = valid.reshape(valid.shape + (1,) * (values.ndim - 1))
+        return np.where(mask, gathered, 0.0), mask
+    
+    def neighbor_mean(self, values=None):
         """
-        ピンデータを出力形式に変換
+        隣接ピンの平均値
         
         Args:
-            pins (list): Pinオブジェクトのリスト
+            values (array-like, optional): (ピン数, ...) の値（省略時は各ピンの値）
             
         Returns:
-            出力形式に応じたデータ
+            numpy.ndarray: 各ピンの隣接ピン平均（隣接ピンがなければ NaN）
         """
-        pass
+        values = self._stencil_values(values)
+        gathered, mask = self._gather_neighbors(values)
+        count = mask.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return gathered.sum(axis=1) / count
     
-    def get_output(self):
-        """出力データを取得"""
-        return self.output
+    def smooth(self, values=None, weight=0.5):
+        """
+        隣接平均による平滑化
+        
+        Args:
+            values (array-like, optional): (ピン数, ...) の値（省略時は各ピンの値）
+            weight (float): 隣接平均の重み（0 で元の値、1 で隣接平均）
+            
+        Returns:
+            numpy.ndarray: 平滑化した値
+        """
+        values = self._stencil_values(values)
+        mean = self.neighbor_mean(values)
+        # 隣接ピンのない場合（中心1本だけの格子）は元の値のまま
+        return np.where(np.isnan(mean), values, (1 - weight) * values + weight * mean)
+    
+    def local_peaking_factor(self, values=None):
+        """
+        局所ピーキング係数（自ピンと隣接ピンの平均に対する比）
+        
+        Args:
+            values (array-like, optional): (ピン数, ...) の値（省略時は各ピンの値）
+            
+        Returns:
+            numpy.ndarray: 各ピンの局所ピーキング係数
+        """
+        values = self._stencil_values(values)
+        gathered, mask = self._gather_neighbors(values)
+        local_mean = (values + gathered.sum(axis=1)) / (mask.sum(axis=1) + 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return values / local_mean
+    
+    def gradient(self, values=None):
+        """
+        隣接ピンとの差分から最小二乗で求めた勾配
+        
+        Args:
+            values (array-like, optional): (ピン数, ...) の値（省略時は各ピンの値）
+            
+        Returns:
+            tuple: (d/dx, d/dy)。それぞれ values と同じ形状（求まらないピンは NaN）
+        """
+        t = self._require_template()
+        values = self._stencil_values(values)
+        gathered, mask = self._gather_neighbors(values)
+        valid = t.neighbors >= 0
+        index = np.where(valid, t.neighbors, 0)
+        dx = np.where(valid, t.x[index] - t.x[:, np.newaxis], 0.0)
+        dy = np.where(valid, t.y[index] - t.y[:, np.newaxis], 0.0)
+        dv = np.where(mask, gathered - values[:, np.newaxis], 0.0)
+        
+        # ピンごとの 2x2 正規方程式を閉じた形で解く
+        axx = (dx * dx).sum(axis=1)
+        axy = (dx * dy).sum(axis=1)
+        ayy = (dy * dy).sum(axis=1)
+        det = axx * ayy - axy * axy
+        extra = (1,) * (values.ndim - 1)
+        dx = dx.reshape(dx.shape + extra)
+        dy = dy.reshape(dy.shape + extra)
+        bx = (dx * dv).sum(axis=1)
+        by = (dy * dv).sum(axis=1)
+        axx, axy, ayy, det = (a.reshape(a.shape + extra) for a in (axx, axy, ayy, det))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (ayy * bx - axy * by) / det, (axx * by - axy * bx) / det
+    
+    def subchannel_average(self, values=None):
+        """
+        三角形サブチャンネルごとの3ピン平均
+        
+        Args:
+            values (array-like, optional): (ピン数, ...) の値（省略時は各ピンの値）
+            
+        Returns:
+            numpy.ndarray: (サブチャンネル数, ...) の平均値（順序は subchannel_pins() と同じ）
+        """
+        values = self._stencil_values(values)
+        return values[self.subchannel_pins()].mean(axis=1)
+
+
+class CoreMap(PinOrdering):
+    """炉心（燃料集合体の六角配列）を表すクラス"""
+    
+    def __init__(self, core_rings, assembly_pitch, rings=5, pitch=1.0, assembly_types=None):
+        """
+        炉心配置の初期化
+        
+        Args:
+            core_rings (int): 集合体配列のリング数（中心集合体を除く）
+            assembly_pitch (float): 集合体間距離（集合体ピッチ）
+            rings (int): 集合体内のピンのリング数（既定の集合体タイプ）
+            pitch (float): ピンピッチ（既定の集合体タイプ）
+            assembly_types (list, optional): 集合体ごとの (リング数, ピンピッチ)。
+                集合体の螺旋順に並べる。省略時は全集合体が (rings, pitch)
+        
+        Note:
+            炉心のピン座標は実寸の幾何（LatticeTemplate.geometric_y）で配置するため、
+            pitch ≠ 1 でも隣接ピン間距離は pitch になる。単一集合体の HexagonalGrid は
+            出力互換のため従来の y 座標式のままで、補間係数もそれに合わせて計算する。
+        """
+        self.core_rings = core_rings
+        self.assembly_pitch = assembly_pitch
+        
+        # 集合体配置（集合体の螺旋順）
+        (self.assembly_ring, self.assembly_position,
+         self.assembly_q, self.assembly_r) = hex_lattice_axial(core_rings)
+        # 集合体内のピン配列は頂点が 0, 60, ... 度方向の六角形になるので、集合体どうしは
+        # 30度回転した向き（隣接集合体が 30, 90, ... 度方向）で敷き詰める
+        self.assembly_x = assembly_pitch * (math.sqrt(3) / 2) * self.assembly_q
+        self.assembly_y = assembly_pitch * (self.assembly_q / 2 + self.assembly_r)
+        
+        n_assemblies = len(self.assembly_q)
+        if assembly_types is None:
+            assembly_types = [(rings, pitch)] * n_assemblies
+        if len(assembly_types) != n_assemblies:
+            raise ValueError(f"集合体タイプの数 {len(assembly_types)} が集合体数 {n_assemblies} と一致しません")
+        self.assembly_types = [tuple(t) for t in assembly_types]
+        
+        # 可視化用（最小のピンピッチ）
+        self.pitch = min(p for _, p in self.assembly_types)
+        self.pins = []
+        self.arrays = None
+        
+        # 炉心全体のピン → 集合体、集合体内ID の対応
+        self.assembly_index = None
+        self.local_spiral_id = None
+        self.local_subchannel_id = None
+        self.assembly_offsets = None  # 集合体ごとの先頭ピンインデックス
+        self._types = []  # 集合体タイプの一覧
+        self._type_of = None  # 集合体 → 集合体タイプ番号
+        self._lattices = []  # 集合体タイプごとの格子テンプレート
+        self._weight_cache = {}  # 集合体タイプ番号 → (補間方法, 重み行列)
+    
+    @property
+    def n_assemblies(self):
+        """集合体数"""
+        return len(self.assembly_q)
+    
+    def _local_pin_order(self, type_index):
+        """集合体タイプ内のピンを螺旋ID順に並べるインデックス"""
+        return np.argsort(self._lattices[type_index].spiral_id, kind='stable')
+    
+    def generate_pins(self):
+        """全集合体のピンを一括生成（集合体の螺旋順、集合体内は螺旋ID順）"""
+        self._types = sorted(set(self.assembly_types))
+        self._type_of = np.array([self._types.index(t) for t in self.assembly_types], dtype=np.int64)
+        self._lattices = [get_lattice_template(rings, pitch) for rings, pitch in self._types]
+        self._weight_cache = {}
+        
+        counts = np.array([len(self._lattices[t]) for t in self._type_of], dtype=np.int64)
+        self.assembly_offsets = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+        total = int(counts.sum())
+        
+        ring = np.empty(total, dtype=np.int64)
+        position = np.empty(total, dtype=np.int64)
+        q = np.empty(total, dtype=np.int64)
+        r = np.empty(total, dtype=np.int64)
+        x = np.empty(total)
+        y = np.empty(total)
+        self.assembly_index = np.repeat(np.arange(self.n_assemblies), counts)
+        self.local_spiral_id = np.empty(total, dtype=np.int64)
+        self.local_subchannel_id = np.empty(total, dtype=np.int64)
+        
+        # 集合体タイプごとに、同タイプの全集合体へ局所格子をブロードキャスト
+        for t, lattice in enumerate(self._lattices):
+            assemblies = np.flatnonzero(self._type_of == t)
+            local = lattice
+            order = self._local_pin_order(t)
+            targets = (self.assembly_offsets[assemblies][:, np.newaxis] + np.arange(len(order))).ravel()
+            n = len(assemblies)
+            
+            ring[targets] = np.tile(local.ring[order], n)
+            position[targets] = np.tile(local.position[order], n)
+            q[targets] = np.tile(local.q[order], n)
+            r[targets] = np.tile(local.r[order], n)
+            x[targets] = (self.assembly_x[assemblies][:, np.newaxis] + local.x[order]).ravel()
+            y[targets] = (self.assembly_y[assemblies][:, np.newaxis] + local.geometric_y[order]).ravel()
+            self.local_spiral_id[targets] = np.tile(local.spiral_id[order], n)
+            self.local_subchannel_id[targets] = np.tile(local.subchannel_id[order], n)
+        
+        self.arrays = PinArrays(ring, q, r, x, y, position)
+        self.pins = PinList(self.arrays)
+    
+    def column(self, name):
+        """ピンデータの列を配列で取得（炉心は常に列指向）"""
+        return getattr(self.arrays, name)
+    
+    def assign_spiral_ids(self):
+        """炉心全体の螺旋ID（集合体の螺旋順 → 集合体内の螺旋ID順）を割り当て"""
+        self.arrays.spiral_id[:] = np.arange(len(self.arrays))
+        self._id_permutations = None
+    
+    def convert_to_subchannel_ids(self):
+        """
+        炉心全体のサブチャンネルIDを割り当て
+        
+        集合体を上段左端から右へ、上から下へ並べ、各集合体内は
+        集合体内サブチャンネルID順に連番を振る（1始まり）。
+        """
+        # 集合体中心の y は assembly_pitch * (q + 2r) / 2、x は q に比例するので整数で並べ替えられる
+        assembly_order = np.lexsort((self.assembly_q, -(self.assembly_q + 2 * self.assembly_r)))
+        counts = np.bincount(self.assembly_index, minlength=self.n_assemblies)
+        offsets = np.empty(self.n_assemblies, dtype=np.int64)
+        offsets[assembly_order] = np.concatenate([[0], np.cumsum(counts[assembly_order])[:-1]])
+        self.arrays.subchannel_id[:] = offsets[self.assembly_index] + self.local_subchannel_id
+        self._id_permutations = None
+    
+    def assembly_slice(self, assembly):
+        """集合体（螺旋順の番号）に属するピンの範囲"""
+        start = int(self.assembly_offsets[assembly])
+        stop = start + len(self._lattices[self._type_of[assembly]])
+        return slice(start, stop)
+    
+    def _type_weights(self, strategy, type_index):
+        """集合体タイプの重み行列（集合体内の螺旋ID順）"""
+        cached = self._weight_cache.get(type_index)
+        if cached is not None and cached[0] is strategy:
+            return cached[1]
+        
+        local = self._lattices[type_index]
+        order = self._local_pin_order(type_index)
+        # 補間係数は単一集合体の HexagonalGrid と同じ値になるよう、テンプレートの座標で計算する
+        factors = strategy.compute_factors(local.x[order], local.y[order], local.ring[order])
+        weights = strategy.weight_matrix(factors)
+        self._weight_cache[type_index] = (strategy, weights)
+        return weights
+    
+    def interpolate(self, strategy, input_batch):
+        """
+        全集合体の補間を一括実行
+        
+        Args:
+            strategy (InterpolationStrategy): 補間方法（全集合体で共通）
+            input_batch: 集合体ごとの入力値の辞書のリスト（螺旋順）、
+                または (集合体数, 入力値の数) の配列
+                
+        Returns:
+            numpy.ndarray: 炉心全体のピン値
+        """
+        strategy.require_weights()
+        if len(input_batch) != self.n_assemblies:
+            raise ValueError(f"入力値の数 {len(input_batch)} が集合体数 {self.n_assemblies} と一致しません")
+        if isinstance(input_batch[0], dict):
+            input_batch = [strategy.input_vector(values) for values in input_batch]
+        inputs = np.asarray(input_batch, dtype=np.float64)
+        
+        values = np.empty(len(self.arrays))
+        for t in range(len(self._lattices)):
+            assemblies = np.flatnonzero(self._type_of == t)
+            weights = self._type_weights(strategy, t)
+            targets = (self.assembly_offsets[assemblies][:, np.newaxis] + np.arange(len(weights))).ravel()
+            values[targets] = (inputs[assemblies] @ weights.T).ravel()
+        
+        self.arrays.value = values
+        return values
+
+
+class InterpolationStrategy(ABC):
+    """
+    補間方法の基底クラス
+    
+    interpolate() だけを実装した補間方法はピンへの値の割り当てにのみ使える。
+    compute_factors() / input_vector() / weight_matrix() / vector_to_input_values() を
+    すべて実装した補間方法は supports_weights = True とし、重み行列へのコンパイル、
+    炉心モード、一括処理、フィットに使える。
+    """
+    
+    # 重み行列（入力値に対する線形写像）の計算に対応しているかどうか
+    supports_weights = False
+    
+    def require_weights(self):
+        """
+        重み行列に対応していることを確認
+        
+        Raises:
+            ValueError: supports_weights が False の場合
+        """
+        if not self.supports_weights:
+            raise ValueError(f"{type(self).__name__} は重み行列に対応していません"
+                             f"（supports_weights = False の補間方法は interpolate() のみ使用できます）")
+    
+    @abstractmethod
+    def interpolate(self, pins, input_values):
+        """
+        各ピンに値を割り当てる
+        
+        Args:
+            pins (list): Pinオブジェクトのリスト
+            input_values (dict): 補間に必要な入力値
+        """
+        pass
+    
+    def compute_factors(self, x, y, ring):
+        """
+        ピン配置だけで決まる補間係数を配列で計算
+        
+        Args:
+            x, y (numpy.ndarray): ピン座標
+            ring (numpy.ndarray): リング番号
+            
+        Returns:
+            dict: evaluate() に渡す係数配列
+        """
+        self.require_weights()
+        raise NotImplementedError(f"{type(self).__name__}.compute_factors() が実装されていません")
+    
+    def prepare(self, pins):
+        """
+        ピンリストに対する補間係数を取得（同じピンリストに対しては再計算しない）
+        
+        Args:
+            pins (list): Pinオブジェクトのリスト（または PinList）
+            
+        Returns:
+            dict: 補間係数
+        """
+        if getattr(self, '_prepared_pins', None) is pins and self._prepared_count == len(pins):
+            return self._prepared_factors
+        
+        self._prepared_factors = self.compute_factors(*pin_geometry(pins))
+        self._prepared_pins = pins
+        self._prepared_count = len(pins)
+        return self._prepared_factors
+    
+    def input_vector(self, input_values):
+        """
+        入力値の辞書を重み行列に掛けるベクトルに変換
+        
+        Args:
+            input_values (dict): interpolate() と同じ入力値
+            
+        Returns:
+            numpy.ndarray: 入力値ベクトル
+        """
+        self.require_weights()
+        raise NotImplementedError(f"{type(self).__name__}.input_vector() が実装されていません")
+    
+    def weight_matrix(self, factors):
+        """
+        入力値ベクトルから全ピンの値への線形写像を作成
+        
+        Args:
+            factors (dict): compute_factors() の結果
+            
+        Returns:
+            numpy.ndarray: (ピン数, 入力値の数) の重み行列
+        """
+        self.require_weights()
+        raise NotImplementedError(f"{type(self).__name__}.weight_matrix() が実装されていません")
+    
+    def vector_to_input_values(self, vector):
+        """
+        入力値ベクトルを interpolate() の入力値の辞書に戻す（input_vector() の逆）
+        
+        Args:
+            vector (numpy.ndarray): 入力値ベクトル（軸方向分布は (入力値の数, 軸方向点数)）
+            
+        Returns:
+            dict: 入力値
+        """
+        self.require_weights()
+        raise NotImplementedError(f"{type(self).__name__}.vector_to_input_values() が実装されていません")
+    
+    def fit_operator(self, factors):
+        """
+        ピンの値から入力値ベクトルへの最小二乗の線形写像（重み行列の擬似逆行列）
+        
+        補間は入力値に対して線形なので、フィットは反復計算なしの行列積になる。
+        同じ係数に対しては再計算しない。
+        
+        Args:
+            factors (dict): compute_factors() の結果
+            
+        Returns:
+            numpy.ndarray: (入力値の数, ピン数) の行列
+        """
+        self.require_weights()
+        if getattr(self, '_fit_factors', None) is not factors:
+            self._fit_operator = np.linalg.pinv(self.weight_matrix(factors))
+            self._fit_factors = factors
+        return self._fit_operator
+    
+    def fit(self, pins, pin_values):
+        """
+        ピンの値（測定値・計算値）を最もよく再現する入力値を最小二乗で求める
+        
+        Args:
+            pins (list): Pinオブジェクトのリスト（または PinList）
+            pin_values (array-like): ピン順の値（軸方向分布は (ピン数, 軸方向点数)）
+            
+        Returns:
+            dict: interpolate() に渡せる入力値
+        """
+        operator = self.fit_operator(self.prepare(pins))
+        return self.vector_to_input_values(operator @ np.asarray(pin_values, dtype=np.float64))
+    
+    def fit_batch(self, pins, value_batch):
+        """
+        多数のピン値マップに対する入力値ベクトルを一括で求める
+        
+        Args:
+            pins (list): Pinオブジェクトのリスト（または PinList）
+            value_batch (array-like): (マップ数, ピン数) の値
+            
+        Returns:
+            numpy.ndarray: (マップ数, 入力値の数) の入力値ベクトル
+        """
+        operator = self.fit_operator(self.prepare(pins))
+        return np.asarray(value_batch, dtype=np.float64) @ operator.T
+
+
+def pin_geometry(pins):
+    """
+    ピンリストから座標とリング番号の配列を取得
+    
+    Args:
+        pins (list): Pinオブジェクトのリスト（または PinList）
+        
+    Returns:
+        tuple: (x, y, ring) の配列
+    """
+    if isinstance(pins, PinList):
+        return pins.arrays.x, pins.arrays.y, pins.arrays.ring
+    x = np.array([pin.coordinates[0] for pin in pins], dtype=np.float64)
+    y = np.array([pin.coordinates[1] for pin in pins], dtype=np.float64)
+    ring = np.array([pin.ring for pin in pins], dtype=np.int64)
+    return x, y, ring
+
+
+def store_pin_values(pins, values):
+    """
+    計算した値の配列をピンに書き戻す
+    
+    Args:
+        pins (list): Pinオブジェクトのリスト（または PinList）
+        values (numpy.ndarray): ピン順の値（軸方向分布は (ピン数, 軸方向点数)）
+    """
+    if isinstance(pins, PinList):
+        pins.arrays.value = np.array(values, dtype=np.float64)
+        return
+    if values.ndim > 1:
+        # 軸方向分布は連続配列の行ビューとして持たせる
+        for pin, row in zip(pins, values):
+            pin.value = row
+        return
+    for pin, value in zip(pins, values.tolist()):
+        pin.value = value
+
+
+def _polar_factors(x, y, ring):
+    """
+    ピンの角度（0〜2π）とリング比（ring / 最大リング）を配列で計算
+    
+    Returns:
+        tuple: (中心ピンのマスク, 角度, リング比)
+    """
+    center = ring == 0
+    
+    angle = np.arctan2(y, x)
+    # -π〜πの範囲を0〜2πに変換
+    angle = np.where(angle < 0, angle + 2 * math.pi, angle)
+    
+    # リングごとの重み（中心からの距離に応じた補間）
+    max_ring = ring.max() if len(ring) else 0
+    ring_ratio = ring / max_ring if max_ring > 0 else np.zeros(len(ring))
+    return center, angle, ring_ratio
+
+
+def _sector_factors(x, y, ring):
+    """
+    六角形の頂点方向（0, 60, ..., 300度）に対する各ピンの補間係数を計算
+    
+    Returns:
+        dict: 'center', 'ring_ratio', 'sector', 'next_sector', 'sector_pos'
+    """
+    center, angle, ring_ratio = _polar_factors(x, y, ring)
+    
+    # 角度を0〜360度に変換
+    angle_deg = np.degrees(angle)
+    
+    # 最も近い2つの頂点を特定
+    sector = np.floor(angle_deg / 60).astype(np.int64)
+    
+    # 2つの頂点間での角度の位置（0〜1）
+    sector_pos = (angle_deg - sector * 60) / 60
+    
+    return {'center': center, 'ring_ratio': ring_ratio, 'sector': sector % 6,
+            'next_sector': (sector + 1) % 6, 'sector_pos': sector_pos}
+
+
+def _sector_weight_matrix(factors):
+    """
+    中心値と六角頂点値（6点）から全ピンの値への (ピン数, 7) の重み行列
+    
+    値 = 中心 * (1 - リング比) + 頂点[sector] * (1 - sector_pos) * リング比
+         + 頂点[next_sector] * sector_pos * リング比
+    """
+    ring_ratio = factors['ring_ratio']
+    sector_pos = factors['sector_pos']
+    rows = np.arange(len(ring_ratio))
+    
+    weights = np.zeros((len(ring_ratio), 7))
+    weights[:, 0] = 1 - ring_ratio
+    weights[rows, 1 + factors['sector']] = (1 - sector_pos) * ring_ratio
+    weights[rows, 1 + factors['next_sector']] = sector_pos * ring_ratio
+    weights[factors['center']] = 0.0
+    weights[factors['center'], 0] = 1.0
+    return weights
+
+
+class ThreePointInterpolation(InterpolationStrategy):
+    """3点補間による値の割り当て"""
+    
+    supports_weights = True
+    
+    def interpolate(self, pins, input_values):
+        """
+        中心ピーク値、外側ピーク値、外側最小値による3点補間
+        
+        Args:
+            pins (list): Pinオブジェクトのリスト
+            input_values (dict): {
+                'center_peak': float, # 中心ピークの値
+                'outer_peak': float,  # 外側ピークの値
+                'outer_min': float    # 外側最小値
+            }
+        """
+        store_pin_values(pins, self.evaluate(self.prepare(pins), input_values))
+    
+    def compute_factors(self, x, y, ring):
+        """角度係数とリング比を計算"""
+        center, angle, ring_ratio = _polar_factors(x, y, ring)
+        
+        # 角度に応じた値の変化（コサイン関数で滑らかに変化）
+        # 0度方向（基準方向）でピーク値、180度方向で最小値
+        angle_factor = (1 + np.cos(angle)) / 2  # 0〜1の範囲
+        
+        return {'center': center, 'ring_ratio': ring_ratio, 'angle_factor': angle_factor}
+    
+    def evaluate(self, factors, input_values):
+        """
+        係数と入力値から全ピンの値を一括計算
+        
+        Args:
+            factors (dict): compute_factors() の結果
+            input_values (dict): interpolate() と同じ入力値
+            
+        Returns:
+            numpy.ndarray: ピン順の値
+        """
+        center_peak = input_values.get('center_peak', 100.0)
+        outer_peak = input_values.get('outer_peak', 80.0)
+        outer_min = input_values.get('outer_min', 60.0)
+        
+        # 最終的な値の計算
+        value_range = outer_peak - outer_min
+        values = outer_min + value_range * factors['angle_factor']
+        
+        # 中心からの値の変化を反映（線形補間）
+        center_to_outer_diff = values - center_peak
+        values = center_peak + center_to_outer_diff * factors['ring_ratio']
+        
+        # 中心ピン
+        values[factors['center']] = center_peak
+        return values
+    
+    def input_vector(self, input_values):
+        """[中心ピーク値, 外側ピーク値, 外側最小値] のベクトルに変換"""
+        return np.array([input_values.get('center_peak', 100.0),
+                         input_values.get('outer_peak', 80.0),
+                         input_values.get('outer_min', 60.0)], dtype=np.float64)
+    
+    def weight_matrix(self, factors):
+        """
+        (ピン数, 3) の重み行列を作成
+        
+        値 = 中心 * (1 - リング比) + 外側ピーク * 角度係数 * リング比
+             + 外側最小 * (1 - 角度係数) * リング比
+        """
+        ring_ratio = factors['ring_ratio']
+        angle_factor = factors['angle_factor']
+        
+        weights = np.empty((len(ring_ratio), 3))
+        weights[:, 0] = 1 - ring_ratio
+        weights[:, 1] = angle_factor * ring_ratio
+        weights[:, 2] = (1 - angle_factor) * ring_ratio
+        weights[factors['center']] = [1.0, 0.0, 0.0]
+        return weights
+    
+    def vector_to_input_values(self, vector):
+        """[中心ピーク値, 外側ピーク値, 外側最小値] を入力値の辞書に（2次元なら各値は軸方向のリスト）"""
+        center_peak, outer_peak, outer_min = np.asarray(vector, dtype=np.float64).tolist()
+        return {'center_peak': center_peak, 'outer_peak': outer_peak, 'outer_min': outer_min}
+
+
+class SevenPointInterpolation(InterpolationStrategy):
+    """7点補間による値の割り当て"""
+    
+    supports_weights = True
+    
+    def interpolate(self, pins, input_values):
+        """
+        中心ピーク値と六角頂点位置のピーク値（6点）による7点補間
+        
+        Args:
+            pins (list): Pinオブジェクトのリスト
+            input_values (dict): {
+                'center_peak': float,    # 中心ピークの値
+                'vertex_values': list    # 六角形の頂点位置の値（6点）
+            }
+        """
+        store_pin_values(pins, self.evaluate(self.prepare(pins), input_values))
+    
+    def compute_factors(self, x, y, ring):
+        """隣接する2頂点の番号、頂点間の位置、リング比を計算"""
+        return _sector_factors(x, y, ring)
+    
+    def evaluate(self, factors, input_values):
+        """
+        係数と入力値から全ピンの値を一括計算
+        
+        Args:
+            factors (dict): compute_factors() の結果
+            input_values (dict): interpolate() と同じ入力値
+            
+        Returns:
+            numpy.ndarray: ピン順の値
+        """
+        center_peak = input_values.get('center_peak', 100.0)
+        vertex_values = self._vertex_values(input_values)
+        
+        # 2点間の値を線形補間
+        sector_pos = factors['sector_pos']
+        interpolated_value = (vertex_values[factors['sector']] * (1 - sector_pos)
+                              + vertex_values[factors['next_sector']] * sector_pos)
+        
+        # 中心から頂点への値の変化を反映（線形補間）
+        center_to_vertex_diff = interpolated_value - center_peak
+        values = center_peak + center_to_vertex_diff * factors['ring_ratio']
+        
+        # 中心ピン
+        values[factors['center']] = center_peak
+        return values
+    
+    @staticmethod
+    def _vertex_values(input_values):
+        """頂点値を6点の配列に揃える"""
+        vertex_values = list(input_values.get('vertex_values', [80.0] * 6))
+        
+        # 頂点値が6つでない場合は調整
+        if len(vertex_values) < 6:
+            vertex_values.extend([80.0] * (6 - len(vertex_values)))
+        return np.asarray(vertex_values[:6], dtype=np.float64)
+    
+    def input_vector(self, input_values):
+        """[中心ピーク値, 頂点値1〜6] のベクトルに変換"""
+        return np.concatenate([[input_values.get('center_peak', 100.0)],
+                               self._vertex_values(input_values)])
+    
+    def weight_matrix(self, factors):
+        """(ピン数, 7) の重み行列を作成（_sector_weight_matrix を参照）"""
+        return _sector_weight_matrix(factors)
+    
+    def vector_to_input_values(self, vector):
+        """[中心ピーク値, 頂点値1〜6] を入力値の辞書に"""
+        vector = np.asarray(vector, dtype=np.float64)
+        return {'center_peak': vector[0].tolist(), 'vertex_values': vector[1:].tolist()}
+
+
+class PointSetInterpolation(InterpolationStrategy):
+    """
+    任意の代表点（検出器位置など）の値から全ピンの値を求める補間の基底クラス
+    
+    重みは代表点とピン配置だけで決まるので compute_factors() で1回だけ計算し、
+    値の計算は重み行列と代表点の値の積になる（軸方向分布も同じ重みで一括計算）。
+    入力値は {'point_values': 代表点ごとの値（軸方向分布は (代表点数, 軸方向点数)）}。
+    """
+    
+    supports_weights = True
+    
+    def __init__(self, points):
+        """
+        Args:
+            points (array-like): (代表点数, 2) の代表点の x, y 座標（ピン座標と同じ座標系）
+        """
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    
+    def interpolate(self, pins, input_values):
+        """
+        代表点の値から全ピンの値を補間
+        
+        Args:
+            pins (list): Pinオブジェクトのリスト
+            input_values (dict): {
+                'point_values': list  # 代表点ごとの値（軸方向分布は代表点ごとのリスト）
+            }
+        """
+        store_pin_values(pins, self.evaluate(self.prepare(pins), input_values))
+    
+    def compute_factors(self, x, y, ring):
+        """(ピン数, 代表点数) の重み行列を計算"""
+        return {'weights': self.point_weights(np.asarray(x, dtype=np.float64),
+                                              np.asarray(y, dtype=np.float64))}
+    
+    @abstractmethod
+    def point_weights(self, x, y):
+        """
+        代表点の値から各ピンの値への重み
+        
+        Args:
+            x, y (numpy.ndarray): ピン座標
+            
+        Returns:
+            numpy.ndarray: (ピン数, 代表点数) の重み行列
+        """
+        pass
+    
+    def evaluate(self, factors, input_values):
+        """
+        係数と代表点の値から全ピンの値を一括計算
+        
+        Args:
+            factors (dict): compute_factors() の結果
+            input_values (dict): interpolate() と同じ入力値
+            
+        Returns:
+            numpy.ndarray: ピン順の値（軸方向分布は (ピン数, 軸方向点数)）
+        """
+        return factors['weights'] @ self.input_vector(input_values)
+    
+    def input_vector(self, input_values):
+        """代表点の値の配列に変換"""
+        point_values = np.asarray(input_values['point_values'], dtype=np.float64)
+        if len(point_values) != len(self.points):
+            raise ValueError(f"代表点の値の数 {len(point_values)} が代表点数 {len(self.points)} と一致しません")
+        return point_values
+    
+    def weight_matrix(self, factors):
+        """(ピン数, 代表点数) の重み行列"""
+        return factors['weights']
+    
+    def vector_to_input_values(self, vector):
+        """代表点の値の配列を入力値の辞書に"""
+        return {'point_values': np.asarray(vector, dtype=np.float64).tolist()}
+
+
+class BarycentricInterpolation(PointSetInterpolation):
+    """代表点の Delaunay 三角形分割上の重心座標（区分線形）による補間"""
+    
+    def point_weights(self, x, y):
+        """
+        各ピンを含む三角形の3頂点に重心座標の重みを与える
+        
+        三角形分割の外側（代表点の凸包の外）のピンは最も近い代表点の値をとる。
+        """
+        from matplotlib.tri import Triangulation
+        
+        points = self.points
+        weights = np.zeros((len(x), len(points)))
+        
+        triangle = np.full(len(x), -1, dtype=np.int64)
+        if len(points) >= 3:
+            triangulation = Triangulation(points[:, 0], points[:, 1])
+            triangle = np.asarray(triangulation.get_trifinder()(x, y), dtype=np.int64)
+        
+        inside = np.flatnonzero(triangle >= 0)
+        if len(inside):
+            vertices = triangulation.triangles[triangle[inside]]  # (内側のピン数, 3)
+            xa, ya = points[vertices[:, 0], 0], points[vertices[:, 0], 1]
+            xb, yb = points[vertices[:, 1], 0], points[vertices[:, 1], 1]
+            xc, yc = points[vertices[:, 2], 0], points[vertices[:, 2], 1]
+            det = (xb - xa) * (yc - ya) - (xc - xa) * (yb - ya)
+            lb = ((x[inside] - xa) * (yc - ya) - (xc - xa) * (y[inside] - ya)) / det
+            lc = ((xb - xa) * (y[inside] - ya) - (x[inside] - xa) * (yb - ya)) / det
+            barycentric = np.column_stack((1 - lb - lc, lb, lc))
+            np.add.at(weights, (inside[:, np.newaxis], vertices), barycentric)
+        
+        outside = np.flatnonzero(triangle < 0)
+        if len(outside) and len(points):
+            distance = np.hypot(x[outside, np.newaxis] - points[:, 0], y[outside, np.newaxis] - points[:, 1])
+            weights[outside, distance.argmin(axis=1)] = 1.0
+        return weights
+
+
+class RadialBasisInterpolation(PointSetInterpolation):
+    """代表点を中心とする放射基底関数（1次多項式項付き）による滑らかな補間"""
+    
+    # 放射基底関数（r: 代表点からの距離、epsilon: 形状パラメータ）
+    KERNELS = {
+        'thin_plate': lambda r, epsilon: np.where(r > 0, r * r * np.log(np.where(r > 0, r, 1.0)), 0.0),
+        'cubic': lambda r, epsilon: r ** 3,
+        'linear': lambda r, epsilon: -r,
+        'gaussian': lambda r, epsilon: np.exp(-(epsilon * r) ** 2),
+        'multiquadric': lambda r, epsilon: -np.sqrt(1 + (epsilon * r) ** 2),
+        'inverse_multiquadric': lambda r, epsilon: 1 / np.sqrt(1 + (epsilon * r) ** 2),
+    }
+    
+    def __init__(self, points, kernel='thin_plate', epsilon=1.0, smoothing=0.0):
+        """
+        Args:
+            points (array-like): (代表点数, 2) の代表点の x, y 座標
+            kernel (str): KERNELS のキー
+            epsilon (float): 形状パラメータ（gaussian, multiquadric, inverse_multiquadric）
+            smoothing (float): 平滑化パラメータ（0 で代表点を厳密に通る）
+        """
+        super().__init__(points)
+        if kernel not in self.KERNELS:
+            raise ValueError(f"未対応の基底関数です: {kernel}")
+        self.kernel = kernel
+        self.epsilon = epsilon
+        self.smoothing = smoothing
+    
+    def point_weights(self, x, y):
+        """
+        補間係数を求める連立方程式を代表点の値について解いた形で重み行列を作成
+        
+        [Φ + λI  P] [w]   [f]
+        [P^T     0] [c] = [0]   （Φ: 代表点間の基底関数、P: [1, x, y]）
+        の解は f の線形関数なので、ピンの値 = [Φ_pin, P_pin] A^-1 [I; 0] f となる。
+        """
+        points = self.points
+        n_points = len(points)
+        kernel = self.KERNELS[self.kernel]
+        
+        def basis(px, py):
+            distance = np.hypot(px[:, np.newaxis] - points[:, 0], py[:, np.newaxis] - points[:, 1])
+            return np.hstack([kernel(distance, self.epsilon), np.ones((len(px), 1)),
+                              px[:, np.newaxis], py[:, np.newaxis]])
+        
+        # 1次多項式項は3点以上ないと決まらない
+        n_poly = 3 if n_points >= 3 else 0
+        system = basis(points[:, 0], points[:, 1])[:, :n_points + n_poly]
+        system[:, :n_points] += self.smoothing * np.eye(n_points)
+        system = np.vstack([system, np.hstack([system[:, n_points:].T, np.zeros((n_poly, n_poly))])])
+        rhs = np.vstack([np.eye(n_points), np.zeros((n_poly, n_points))])
+        
+        # 代表点が一直線上にある場合などは特異になるので最小二乗で解く
+        coefficients = np.linalg.lstsq(system, rhs, rcond=None)[0]
+        return basis(x, y)[:, :n_points + n_poly] @ coefficients
+
+
+def pin_columns(pins, expand_axial=True):
+    """
+    ピンリストを出力用の列配列に変換
+    
+    Args:
+        pins (list): Pinオブジェクトのリスト（または PinList）
+        expand_axial (bool): 軸方向分布の値を 'value_z0', 'value_z1', ... に展開するかどうか
+            （False の場合は 'value' を (ピン数, 軸方向点数) のまま返す）
+        
+    Returns:
+        dict: 列名 → 配列。ID・位置の未割り当ては -1、値の未割り当ては NaN
+    """
+    if isinstance(pins, PinList):
+        arrays = pins.arrays
+        columns = {
+            'spiral_id': arrays.spiral_id,
+            'subchannel_id': arrays.subchannel_id,
+            'ring': arrays.ring,
+            'position': arrays.position,
+            'x': arrays.x,
+            'y': arrays.y,
+        }
+        values = arrays.value
+    else:
+        def optional_ids(name):
+            return np.array([-1 if getattr(pin, name) is None else getattr(pin, name) for pin in pins],
+                            dtype=np.int64)
+        
+        columns = {
+            'spiral_id': optional_ids('id'),
+            'subchannel_id': optional_ids('subchannel_id'),
+            'ring': optional_ids('ring'),
+            'position': optional_ids('position'),
+            'x': np.array([pin.coordinates[0] for pin in pins], dtype=np.float64),
+            'y': np.array([pin.coordinates[1] for pin in pins], dtype=np.float64),
+        }
+        raw_values = [pin.value for pin in pins]
+        num_z = max((np.size(v) for v in raw_values if v is not None and np.ndim(v) > 0), default=0)
+        if num_z:
+            values = np.array([np.full(num_z, np.nan) if v is None else v for v in raw_values], dtype=np.float64)
+        else:
+            values = np.array([np.nan if v is None else v for v in raw_values], dtype=np.float64)
+    
+    columns['value'] = values
+    return expand_axial_columns(columns) if expand_axial else columns
+
+
+def expand_axial_columns(columns):
+    """
+    (ピン数, 軸方向点数) の 'value' 列を 'value_z0', 'value_z1', ... に展開
+    
+    Args:
+        columns (dict): 列名 → 配列（pin_columns(..., expand_axial=False) の結果など）
+        
+    Returns:
+        dict: 展開後の列（'value' が1次元ならそのまま）
+    """
+    values = columns.get('value')
+    if values is None or values.ndim < 2:
+        return columns
+    expanded = {name: column for name, column in columns.items() if name != 'value'}
+    for z_index in range(values.shape[1]):
+        expanded[f'value_z{z_index}'] = values[:, z_index]
+    return expanded
+
+
+class OutputBuilder(ABC):
+    """出力形式の基底クラス"""
+    
+    # 未割り当て（-1）を空欄として出力する整数列
+    OPTIONAL_INT_COLUMNS = ('spiral_id', 'subchannel_id', 'position')
+    
+    def __init__(self, chunk_size=100000, progress=None):
+        """
+        Args:
+            chunk_size (int): 一度に書き込む行数（メモリ使用量の上限を決める）
+            progress (callable, optional): progress(書き込み済み行数, 総行数) を
+                チャンクごとに呼び出すコールバック
+        """
+        self.output = None
+        self.chunk_size = chunk_size
+        self.progress = progress
+    
+    @abstractmethod
+    def build_data(self, pins):
+        """
+        ピンデータを出力形式に変換
+        
+        Args:
+            pins (list): Pinオブジェクトのリスト
+            
+        Returns:
+            出力形式に応じたデータ
+        """
+        pass
+    
+    @abstractmethod
+    def write_columns(self, columns, filename):
+        """
+        列配列を出力形式で書き込み（build_data() と一括処理の共通部分）
+        
+        Args:
+            columns (dict): pin_columns(..., expand_axial=False) と同じ形式の列配列
+            filename (str): 出力ファイル名
+            
+        Returns:
+            str: 出力ファイルパス
+        """
+        pass
+    
+    def get_output(self):
+        """出力データを取得"""
+        return self.output
+    
+    def iter_slices(self, total):
+        """
+        chunk_size 行ずつの範囲を順に返し、各チャンクの処理後に progress を呼ぶ
+        
+        Args:
+            total (int): 総行数
+            
+        Yields:
+            tuple: (開始行, 終了行)
+        """
+        for start in range(0, total, self.chunk_size):
+            stop = min(start + self.chunk_size, total)
+            yield start, stop
+            if self.progress:
+                self.progress(stop, total)
+    
+    def iter_chunks(self, columns):
+        """
+        列配列を chunk_size 行ずつの DataFrame に分割して順に返す
+        
+        Args:
+            columns (dict): pin_columns() の結果
+            
+        Yields:
+            pandas.DataFrame: 各チャンク（列配列のスライスから作成）
+        """
+        total = len(next(iter(columns.values())))
+        for start, stop in self.iter_slices(total):
+            chunk = {}
+            for name, column in columns.items():
+                column = column[start:stop]
+                if name in self.OPTIONAL_INT_COLUMNS:
+                    column = pd.array(column, dtype='Int64')
+                    column[column < 0] = pd.NA
+                chunk[name] = column
+            yield pd.DataFrame(chunk, copy=False)
 
 
 class CSVOutputBuilder(OutputBuilder):
     """CSV形式の出力ビルダー"""
     
-    def build_data(self, pins, filename="pin_data.csv"):
+    def build_data(self, pins, filename="pin_data.csv"):
+        """
+        CSVフォーマットでデータを構築（列配列からチャンクごとに書き込み）
+        
+        Args:
+            pins (list): Pinオブジェクトのリスト
+            filename (str): 出力ファイル名
+            
+        Returns:
+            str: 出力ファイルパス
+        """
+        return self.write_columns(pin_columns(pins, expand_axial=False), filename)
+    
+    def write_columns(self, columns, filename):
+        """列配列をCSVに書き込み（軸方向分布は value_z0, value_z1, ... の列）"""
+        columns = expand_axial_columns(columns)
+        
+        # CSVに書き込み
+        with open(filename, 'w', newline='') as csvfile:
+            for i, chunk in enumerate(self.iter_chunks(columns)):
+                chunk.to_csv(csvfile, header=(i == 0), index=False, lineterminator='\r\n')
+            if not len(next(iter(columns.values()))):
+                csvfile.write(','.join(columns) + '\r\n')
+        
+        self.output = filename
+        return filename
+
+
+class ExcelOutputBuilder(OutputBuilder):
+    """Excel形式の出力ビルダー"""
+    
+    def build_data(self, pins, filename="pin_data.xlsx"):
+        """
+        Excelフォーマットでデータを構築（書き込み専用モードで行を逐次出力）
+        
+        Args:
+            pins (list): Pinオブジェクトのリスト
+            filename (str): 出力ファイル名
+            
+        Returns:
+            str: 出力ファイルパス
+        """
+        return self.write_columns(pin_columns(pins, expand_axial=False), filename)
+    
+    def write_columns(self, columns, filename):
+        """列配列をExcelに書き込み（軸方向分布は value_z0, value_z1, ... の列）"""
+        from openpyxl import Workbook
+        
+        columns = expand_axial_columns(columns)
+        
+        # 書き込み専用モードでは行を追加するたびにディスクへ流すため、メモリ使用量は一定
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Sheet1')
+        sheet.append(list(columns))
+        for chunk in self.iter_chunks(columns):
+            for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False):
+                sheet.append(row)
+        workbook.save(filename)
+        
+        self.output = filename
+        return filename
+
+
+def binary_pin_columns(pins, expand_axial=False):
+    """
+    バイナリ出力用の型付き列配列（ID・リング・位置は int32、座標・値は float64）
+    
+    Args:
+        pins (list): Pinオブジェクトのリスト（または PinList）
+        expand_axial (bool): pin_columns() と同じ
+        
+    Returns:
+        dict: 列名 → 連続配列
+    """
+    return binary_columns(pin_columns(pins, expand_axial=False), expand_axial=expand_axial)
+
+
+def binary_columns(columns, expand_axial=False):
+    """
+    列配列をバイナリ出力用の型に変換（整数は int32、それ以外は float64）
+    
+    Args:
+        columns (dict): pin_columns(..., expand_axial=False) と同じ形式の列配列
+        expand_axial (bool): 軸方向分布を 'value_z0', 'value_z1', ... に展開するかどうか
+        
+    Returns:
+        dict: 列名 → 連続配列
+    """
+    if expand_axial:
+        columns = expand_axial_columns(columns)
+    return {name: np.ascontiguousarray(column, dtype=np.int32 if column.dtype.kind == 'i' else np.float64)
+            for name, column in columns.items()}
+
+
+class ParquetOutputBuilder(OutputBuilder):
+    """Parquet形式の出力ビルダー（pyarrow が必要）"""
+    
+    def __init__(self, compression='zstd', **kwargs):
+        """
+        Args:
+            compression (str): 圧縮方式（'zstd', 'snappy', 'gzip', None など）
+            **kwargs: OutputBuilder の引数（chunk_size, progress）
+        """
+        super().__init__(**kwargs)
+        self.compression = compression
+    
+    def build_data(self, pins, filename="pin_data.parquet"):
+        """
+        Parquetフォーマットでデータを構築（chunk_size 行ごとに行グループとして書き込み）
+        
+        Args:
+            pins (list): Pinオブジェクトのリスト
+            filename (str): 出力ファイル名
+            
+        Returns:
+            str: 出力ファイルパス
+        """
+        return self.write_columns(pin_columns(pins, expand_axial=False), filename)
+    
+    def write_columns(self, columns, filename):
+        """列配列をParquetに書き込み"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        # 軸方向分布は value_z0, value_z1, ... の列として保存
+        columns = binary_columns(columns, expand_axial=True)
+        total = len(next(iter(columns.values())))
+        schema = pa.schema([(name, pa.from_numpy_dtype(column.dtype)) for name, column in columns.items()])
+        
+        with pq.ParquetWriter(filename, schema, compression=self.compression) as writer:
+            for start, stop in self.iter_slices(total):
+                writer.write_table(pa.table({name: column[start:stop] for name, column in columns.items()},
+                                            schema=schema))
+        
+        self.output = filename
+        return filename
+
+
+class HDF5OutputBuilder(OutputBuilder):
+    """HDF5形式の出力ビルダー（h5py が必要）"""
+    
+    def __init__(self, compression='gzip', compression_opts=4, **kwargs):
+        """
+        Args:
+            compression (str): 圧縮フィルタ（'gzip', 'lzf', None）。None のときは
+                チャンク化しない連続配置で書き出す
+            compression_opts (int): 圧縮レベル（gzip のみ）
+            **kwargs: OutputBuilder の引数（chunk_size, progress）
+        """
+        super().__init__(**kwargs)
+        self.compression = compression
+        self.compression_opts = compression_opts if compression == 'gzip' else None
+    
+    def build_data(self, pins, filename="pin_data.h5"):
+        """
+        HDF5フォーマットでデータを構築（列ごとのデータセット、軸方向分布は2次元）
+        
+        Args:
+            pins (list): Pinオブジェクトのリスト
+            filename (str): 出力ファイル名
+            
+        Returns:
+            str: 出力ファイルパス
+        """
+        return self.write_columns(pin_columns(pins, expand_axial=False), filename)
+    
+    def write_columns(self, columns, filename):
+        """列配列をHDF5に書き込み"""
+        import h5py
+        
+        columns = binary_columns(columns)
+        total = len(next(iter(columns.values())))
+        
+        with h5py.File(filename, 'w') as h5file:
+            datasets = {}
+            for name, column in columns.items():
+                if total == 0 or self.compression is None:
+                    # 空のデータセットはチャンク化できない（圧縮フィルタもチャンクが前提）。
+                    # 無圧縮なら連続配置にして load_pin_data でメモリマップできるようにする
+                    datasets[name] = h5file.create_dataset(name, shape=column.shape, dtype=column.dtype)
+                    continue
+                chunks = (min(self.chunk_size, total),) + column.shape[1:]
+                datasets[name] = h5file.create_dataset(
+                    name, shape=column.shape, dtype=column.dtype, chunks=chunks, shuffle=True,
+                    compression=self.compression, compression_opts=self.compression_opts)
+            for start, stop in self.iter_slices(total):
+                for name, column in columns.items():
+                    datasets[name][start:stop] = column[start:stop]
+        
+        self.output = filename
+        return filename
+
+
+class NPZOutputBuilder(OutputBuilder):
+    """NumPy .npz 形式の出力ビルダー"""
+    
+    def __init__(self, compressed=True, **kwargs):
+        """
+        Args:
+            compressed (bool): zip 圧縮するかどうか
+            **kwargs: OutputBuilder の引数（chunk_size, progress）
         """
-        CSVフォーマットでデータを構築
+        super().__init__(**kwargs)
+        self.compressed = compressed
+    
+    def build_data(self, pins, filename="pin_data.npz"):
+        """
+        .npz フォーマットでデータを構築（列ごとの配列、軸方向分布は2次元）
         
         Args:
             pins (list): Pinオブジェクトのリスト
@@ -309,71 +2037,246 @@ class CSVOutputBuilder(OutputBuilder):
         Returns:
             str: 出力ファイルパス
         """
-        data = []
-        for pin in pins:
-            data.append({
-                'spiral_id': pin.id,
-                'subchannel_id': pin.subchannel_id,
-                'ring': pin.ring,
-                'position': pin.position,
-                'x': pin.coordinates[0],
-                'y': pin.coordinates[1],
-                'value': pin.value
-            })
-        
-        # CSVに書き込み
-        with open(filename, 'w', newline='') as csvfile:
-            fieldnames = ['spiral_id', 'subchannel_id', 'ring', 'position', 'x', 'y', 'value']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            writer.writeheader()
-            for row in data:
-                writer.writerow(row)
+        return self.write_columns(pin_columns(pins, expand_axial=False), filename)
+    
+    def write_columns(self, columns, filename):
+        """列配列を .npz に書き込み"""
+        columns = binary_columns(columns)
+        save = np.savez_compressed if self.compressed else np.savez
+        save(filename, **columns)
+        if self.progress:
+            total = len(next(iter(columns.values())))
+            self.progress(total, total)
         
         self.output = filename
         return filename
 
 
-class ExcelOutputBuilder(OutputBuilder):
-    """Excel形式の出力ビルダー"""
+def _hdf5_memmap(filename, dataset):
+    """
+    HDF5 の非圧縮・連続配置のデータセットを読み取り専用のメモリマップとして開く
     
-    def build_data(self, pins, filename="pin_data.xlsx"):
+    Args:
+        filename (str): HDF5 ファイル
+        dataset (h5py.Dataset): 対象データセット
+        
+    Returns:
+        numpy.memmap or None: メモリマップできない（チャンク化・圧縮・空）場合は None
+    """
+    if dataset.chunks is not None or dataset.size == 0 or dataset.dtype.hasobject:
+        return None
+    offset = dataset.id.get_offset()
+    if offset is None:
+        return None
+    return np.memmap(filename, dtype=dataset.dtype, mode='r', offset=offset, shape=dataset.shape)
+
+
+def _npz_memmap(filename, info):
+    """
+    .npz 内の無圧縮メンバーを読み取り専用のメモリマップとして開く
+    
+    Args:
+        filename (str): .npz ファイル
+        info (zipfile.ZipInfo): 対象メンバー
+        
+    Returns:
+        numpy.memmap or None: メモリマップできない（圧縮・object 型・空）場合は None
+    """
+    import zipfile
+    import struct
+    
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(filename, 'rb') as f:
+        # ローカルファイルヘッダ（30バイト + ファイル名 + 拡張フィールド）の後ろが .npy 本体
+        f.seek(info.header_offset)
+        header = f.read(30)
+        name_length, extra_length = struct.unpack('<HH', header[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if dtype.hasobject or int(np.prod(shape)) == 0:
+        return None
+    return np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape,
+                     order='F' if fortran_order else 'C')
+
+
+def load_pin_data(filename, memory_map=True):
+    """
+    バイナリ出力ビルダーで保存したピンデータを読み込む
+    
+    memory_map=True のとき、ディスク上で非圧縮・連続に置かれた列はメモリマップ
+    （読み取り専用）で返し、必要になった部分だけ読み込む。圧縮された列
+    （HDF5OutputBuilder / NPZOutputBuilder の既定）はメモリマップできないので
+    通常どおりメモリに展開する。大きなファイルを部分的に読むなら
+    HDF5OutputBuilder(compression=None) または
+    NPZOutputBuilder(compressed=False) で書き出しておく。
+    
+    Args:
+        filename (str): .parquet / .h5 / .hdf5 / .npz ファイル
+        memory_map (bool): 可能な列をメモリマップ経由で読むかどうか
+        
+    Returns:
+        dict: 列名 → 配列。軸方向分布は 'value' に (ピン数, 軸方向点数) でまとめる
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(filename, memory_map=memory_map)
+        columns = {name: table.column(name).to_numpy() for name in table.column_names}
+        z_names = [name for name in columns if name.startswith('value_z')]
+        if z_names:
+            z_names.sort(key=lambda name: int(name[len('value_z'):]))
+            columns['value'] = np.column_stack([columns.pop(name) for name in z_names])
+        return columns
+    if extension in ('.h5', '.hdf5'):
+        import h5py
+        columns = {}
+        with h5py.File(filename, 'r') as h5file:
+            for name, dataset in h5file.items():
+                column = _hdf5_memmap(filename, dataset) if memory_map else None
+                columns[name] = dataset[()] if column is None else column
+        return columns
+    if extension == '.npz':
+        columns = {}
+        with np.load(filename) as data:
+            members = {info.filename: info for info in data.zip.infolist()}
+            for name in data.files:
+                column = _npz_memmap(filename, members[name + '.npy']) if memory_map else None
+                columns[name] = data[name] if column is None else column
+        return columns
+    raise ValueError(f"未対応のファイル形式です: {filename}")
+
+
+def hexagon_vertices(x, y, radius):
+    """
+    ピン中心の六角形の頂点座標を一括計算（RegularPolygon(orientation=0) と同じ向き）
+    
+    Args:
+        x, y (numpy.ndarray): ピン中心座標
+        radius (float): 六角形の外接円半径
+        
+    Returns:
+        numpy.ndarray: (ピン数, 6, 2) の頂点座標
+    """
+    theta = np.pi / 2 + np.arange(6) * np.pi / 3
+    return np.stack([np.asarray(x)[:, np.newaxis] + radius * np.cos(theta),
+                     np.asarray(y)[:, np.newaxis] + radius * np.sin(theta)], axis=-1)
+
+
+class PinMapRenderer:
+    """ピン配置全体を1つの PolyCollection で描画するレンダラー"""
+    
+    def __init__(self, x, y, pitch, color_map='viridis', max_labels=None, fontsize=8,
+                 figsize=(10, 8), headless=False):
         """
-        Excelフォーマットでデータを構築
+        図と六角形のコレクションを作成（以降は値の差し替えのみ）
         
         Args:
-            pins (list): Pinオブジェクトのリスト
-            filename (str): 出力ファイル名
-            
-        Returns:
-            str: 出力ファイルパス
+            x, y (numpy.ndarray): ピン中心座標
+            pitch (float): ピンピッチ（六角形の大きさ）
+            color_map (str): カラーマップ名
+            max_labels (int, optional): 表示するラベル数の上限（超える場合は間引く、0 でラベルなし）
+            fontsize (int): ラベルの文字サイズ
+            figsize (tuple): 図の大きさ
+            headless (bool): True の場合は pyplot を使わずに図を作成（バッチ出力用）
         """
-        data = []
-        for pin in pins:
-            data.append({
-                'spiral_id': pin.id,
-                'subchannel_id': pin.subchannel_id,
-                'ring': pin.ring,
-                'position': pin.position,
-                'x': pin.coordinates[0],
-                'y': pin.coordinates[1],
-                'value': pin.value
-            })
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        if headless:
+            self.fig = Figure(figsize=figsize)
+            FigureCanvasAgg(self.fig)
+            self.ax = self.fig.add_subplot()
+        else:
+            self.fig, self.ax = plt.subplots(figsize=figsize)
         
-        # DataFrameに変換
-        df = pd.DataFrame(data)
+        # 隣接ピンと重ならないよう少し小さめに
+        hex_radius = pitch / 2 * 0.9
+        self.collection = PolyCollection(hexagon_vertices(self.x, self.y, hex_radius), cmap=color_map,
+                                         alpha=0.7, edgecolors='k', facecolors='lightgray')
+        self.ax.add_collection(self.collection)
+        self.colorbar = None
         
-        # Excelに書き込み
-        df.to_excel(filename, index=False)
+        # ラベル（間引いたピンのみ、Text オブジェクトは使い回す）
+        n = len(self.x)
+        if max_labels is not None and n > max_labels:
+            step = math.ceil(n / max_labels) if max_labels > 0 else n + 1
+            self.label_indices = np.arange(0, n, step)
+        else:
+            self.label_indices = np.arange(n)
+        self.labels = [self.ax.text(self.x[i], self.y[i], '', ha='center', va='center', fontsize=fontsize)
+                       for i in self.label_indices]
         
-        self.output = filename
-        return filename
+        # グラフの設定
+        self.ax.set_aspect('equal')
+        self.ax.autoscale_view()
+        self.ax.set_xlabel('X')
+        self.ax.set_ylabel('Y')
+    
+    def update(self, values=None, labels=None, title=None):
+        """
+        色・ラベル・タイトルを差し替え
+        
+        Args:
+            values (numpy.ndarray, optional): ピン順の値（None の場合は灰色で描画）
+            labels (list, optional): ピン順のラベル文字列（None の場合は値を表示）
+            title (str, optional): グラフのタイトル
+        """
+        if values is not None:
+            values = np.asarray(values, dtype=np.float64)
+            self.collection.set_array(values)
+            self.collection.set_clim(np.nanmin(values), np.nanmax(values))
+            if self.colorbar is None:
+                self.colorbar = self.fig.colorbar(self.collection, ax=self.ax)
+                self.colorbar.set_label('Value')
+        else:
+            self.collection.set_array(None)
+            self.collection.set_facecolor('lightgray')
+        
+        if labels is None and values is not None:
+            labels = [f"{v:.1f}" for v in values[self.label_indices].tolist()]
+        elif labels is not None:
+            labels = [labels[i] for i in self.label_indices]
+        for text, label in zip(self.labels, labels or [''] * len(self.labels)):
+            text.set_text(label)
+        
+        if title is not None:
+            self.ax.set_title(title)
+    
+    def save(self, filename, dpi=300):
+        """図をファイルに保存"""
+        self.fig.savefig(filename, dpi=dpi, bbox_inches='tight')
+    
+    def render_frames(self, value_sets, filename_pattern, titles=None, dpi=150):
+        """
+        複数の値セットを同じ図で順に描画してPNGに保存
+        
+        Args:
+            value_sets (iterable): ピン順の値配列の並び（(フレーム数, ピン数) の配列も可）
+            filename_pattern (str): 出力ファイル名の書式（例: 'frame_{:04d}.png'）
+            titles (list, optional): フレームごとのタイトル
+            dpi (int): 解像度
+            
+        Returns:
+            list: 出力したファイルパス
+        """
+        filenames = []
+        for i, values in enumerate(value_sets):
+            self.update(values, title=titles[i] if titles else None)
+            filename = filename_pattern.format(i)
+            self.save(filename, dpi=dpi)
+            filenames.append(filename)
+        return filenames
 
 
 class PinAssignmentTool:
     """ピン代表点割り当て・番号付与ツール"""
     
-    def __init__(self, rings=5, pitch=1.0, total_pins=None):
+    def __init__(self, rings=5, pitch=1.0, total_pins=None, columnar=False, core_map=None):
         """
         ツールの初期化
         
@@ -381,14 +2284,19 @@ class PinAssignmentTool:
             rings (int): リング数
             pitch (float): ピン間距離（ピッチ）
             total_pins (int, optional): ピン総数（指定された場合はリング数より優先）
+            columnar (bool): ピンデータを列配列で保持するかどうか（大規模モデル向け）
+            core_map (CoreMap, optional): 炉心モード。指定された場合は単一集合体の
+                格子の代わりに炉心全体を扱い、assign_values() には集合体ごとの入力値を渡す
         """
         # ピン総数からリング数を計算
         if total_pins is not None:
             rings = self.calculate_rings_from_total_pins(total_pins)
+        self.declared_pins = total_pins  # 指定されたピン総数（generate_grid() で実際の数と照合）
             
-        self.grid = HexagonalGrid(rings, pitch)
+        self.grid = core_map if core_map is not None else HexagonalGrid(rings, pitch, columnar=columnar)
         self.interpolator = None
         self.output_builder = None
+        self.weights = None  # コンパイル済みの補間重み行列 (ピン数, 入力値の数)
     
     @staticmethod
     def calculate_rings_from_total_pins(total_pins):
@@ -401,25 +2309,13 @@ class PinAssignmentTool:
         Returns:
             int: リング数
         """
-        if total_pins <= 0:
-            return 0
-            
-        # 六角格子のリングrにおけるピン数は 1 + 3r(r+1)
-        # 累積ピン数を計算し、total_pins以上になる最小のリング数を見つける
-        rings = 0
-        cumulative_pins = 0
-        
-        while cumulative_pins < total_pins:
-            cumulative_pins = sum(1 + 6 * i for i in range(rings + 1))
-            if cumulative_pins >= total_pins:
-                break
-            rings += 1
-            
-        return rings
+        # リング数 R までのピン総数は 1 + 3R(R+1)。これが total_pins 以上になる最小の R
+        return rings_for_pin_count(total_pins)
     
     def set_interpolation_strategy(self, strategy):
         """補間方法の設定"""
         self.interpolator = strategy
+        self.weights = None
     
     def set_output_builder(self, builder):
         """出力ビルダーの設定"""
@@ -429,6 +2325,12 @@ class PinAssignmentTool:
         """グリッドの生成とピン番号付与"""
         self.grid.generate_pins()
         self.grid.assign_spiral_ids()
+        self.weights = None
+        
+        # 六角格子に収まらないピン総数が指定された場合は外周リングが部分的に余る
+        if self.declared_pins is not None and len(self.grid.pins) != self.declared_pins:
+            warnings.warn(f"指定されたピン総数 {self.declared_pins} は六角格子のピン数と一致しないため、"
+                          f"{len(self.grid.pins)} 本（リング数 {self.grid.rings}）で生成しました")
         return self.grid
     
     def convert_to_subchannel_ids(self):
@@ -439,8 +2341,89 @@ class PinAssignmentTool:
         """代表点値の割り当て"""
         if not self.interpolator:
             raise ValueError("補間方法が設定されていません")
+        if isinstance(self.grid, CoreMap):
+            # 炉心モードでは集合体ごとの入力値のリスト
+            self.grid.interpolate(self.interpolator, input_values)
+            return
+        if self.weights is not None:
+            # コンパイル済みの場合は行列ベクトル積のみ
+            store_pin_values(self.grid.pins, self.weights @ self.interpolator.input_vector(input_values))
+            return
         self.interpolator.interpolate(self.grid.pins, input_values)
     
+    def compile_interpolation(self):
+        """
+        補間方法を重み行列にコンパイル
+        
+        ピン配置が固定で入力値だけが変わる場合（パラメータサーベイ、UQサンプル）、
+        以降の assign_values() / assign_values_batch() は行列積だけで計算される。
+        
+        Returns:
+            numpy.ndarray: (ピン数, 入力値の数) の重み行列
+        """
+        if not self.interpolator:
+            raise ValueError("補間方法が設定されていません")
+        if isinstance(self.grid, CoreMap):
+            raise ValueError("炉心モードでは集合体タイプごとの重み行列が assign_values() で自動的に作成されます")
+        self.interpolator.require_weights()
+        factors = self.interpolator.prepare(self.grid.pins)
+        self.weights = self.interpolator.weight_matrix(factors)
+        return self.weights
+    
+    def assign_values_batch(self, input_batch):
+        """
+        複数の入力値に対する全ピンの値を一括計算（ピンへの書き込みは行わない）
+        
+        Args:
+            input_batch: 入力値の辞書のリスト、または (サンプル数, 入力値の数) の配列
+            
+        Returns:
+            numpy.ndarray: (サンプル数, ピン数) の値
+        """
+        if not self.interpolator:
+            raise ValueError("補間方法が設定されていません")
+        if not self.interpolator.supports_weights:
+            # 重み行列に対応しない補間方法は入力値ごとに補間する
+            values = []
+            for input_values in input_batch:
+                self.interpolator.interpolate(self.grid.pins, input_values)
+                values.append(np.array(self.grid.column('value'), dtype=np.float64))
+            return np.array(values)
+        if self.weights is None:
+            self.compile_interpolation()
+        if len(input_batch) and isinstance(input_batch[0], dict):
+            input_batch = [self.interpolator.input_vector(values) for values in input_batch]
+        inputs = np.atleast_2d(np.asarray(input_batch, dtype=np.float64))
+        return inputs @ self.weights.T
+    
+    def fit_input_values(self, pin_values):
+        """
+        ピンの値マップを最もよく再現する補間の入力値を最小二乗で求める
+        
+        Args:
+            pin_values (array-like): ピン順の値（軸方向分布は (ピン数, 軸方向点数)）
+            
+        Returns:
+            dict: assign_values() に渡せる入力値
+        """
+        if not self.interpolator:
+            raise ValueError("補間方法が設定されていません")
+        return self.interpolator.fit(self.grid.pins, pin_values)
+    
+    def fit_input_batch(self, value_batch):
+        """
+        多数のピン値マップに対する入力値ベクトルを一括で求める（assign_values_batch() の逆）
+        
+        Args:
+            value_batch (array-like): (マップ数, ピン数) の値
+            
+        Returns:
+            numpy.ndarray: (マップ数, 入力値の数) の入力値ベクトル
+        """
+        if not self.interpolator:
+            raise ValueError("補間方法が設定されていません")
+        return self.interpolator.fit_batch(self.grid.pins, value_batch)
+    
     def generate_output(self, filename=None):
         """出力の生成"""
         if not self.output_builder:
@@ -479,7 +2462,33 @@ class PinAssignmentTool:
         
         return filename
     
-    def visualize(self, show_values=True, color_map='viridis', filename=None, title=None):
+    def to_subchannel_order(self, values, axis=0):
+        """
+        螺旋ID順のピンデータ配列をサブチャンネルID順に並べ替え
+        
+        Args:
+            values (array-like): 螺旋ID順のピンデータ（ピン × 軸方向 × 時刻 など任意次元）
+            axis (int): ピン方向の軸
+            
+        Returns:
+            numpy.ndarray: サブチャンネルID順のピンデータ
+        """
+        return self.grid.to_subchannel_order(values, axis=axis)
+    
+    def to_spiral_order(self, values, axis=0):
+        """
+        サブチャンネルID順のピンデータ配列を螺旋ID順に並べ替え
+        
+        Args:
+            values (array-like): サブチャンネルID順のピンデータ（任意次元）
+            axis (int): ピン方向の軸
+            
+        Returns:
+            numpy.ndarray: 螺旋ID順のピンデータ
+        """
+        return self.grid.to_spiral_order(values, axis=axis)
+    
+    def visualize(self, show_values=True, color_map='viridis', filename=None, title=None, max_labels=None):
         """
         ピン配置と代表点値の可視化
         
@@ -488,70 +2497,471 @@ class PinAssignmentTool:
             color_map (str): カラーマップ名
             filename (str): 保存するファイル名（Noneの場合は保存しない）
             title (str): グラフのタイトル
+            max_labels (int, optional): 表示するラベル数の上限（大規模モデルでは間引く）
             
         Returns:
             matplotlib.figure.Figure: 作成した図
         """
         # ピンの値が設定されているか確認
-        has_values = all(pin.value is not None for pin in self.grid.pins)
+        values = self.grid.column('value')
+        has_values = values.ndim == 1 and len(values) > 0 and not np.isnan(values).any()
         
-        fig, ax = plt.subplots(figsize=(10, 8))
+        renderer = PinMapRenderer(self.grid.column('x'), self.grid.column('y'), self.grid.pitch,
+                                  color_map=color_map, max_labels=max_labels)
         
-        # 六角形のピンを描画
-        for pin in self.grid.pins:
-            x, y = pin.coordinates
-            
-            # 六角形の描画（ピンを表現）
-            hex_radius = self.grid.pitch / 2 * 0.9  # 隣接ピンと重ならないよう少し小さめに
-            hexagon = RegularPolygon((x, y), numVertices=6, radius=hex_radius,
-                                    orientation=0, alpha=0.7, edgecolor='k')
-            
-            # 値に応じて色を設定
-            if has_values and show_values:
-                values = [pin.value for pin in self.grid.pins]
-                norm = Normalize(vmin=min(values), vmax=max(values))
-                hexagon.set_facecolor(plt.cm.get_cmap(color_map)(norm(pin.value)))
-            else:
-                hexagon.set_facecolor('lightgray')
-            
-            ax.add_patch(hexagon)
+        if show_values and has_values:
+            # 値に応じて色を設定し、値を表示
+            renderer.update(values, title=title or 'ピン配置と代表点値')
+        else:
+            # IDを表示
+            spiral_ids = self.grid.column('spiral_id').tolist()
+            subchannel_ids = self.grid.column('subchannel_id').tolist()
+            labels = [f"S:{s if s >= 0 else None}\nC:{c if c >= 0 else None}"
+                      for s, c in zip(spiral_ids, subchannel_ids)]
+            renderer.update(labels=labels, title=title or 'ピン配置とID')
+        
+        # ファイルに保存
+        if filename:
+            renderer.save(filename)
+        
+        plt.tight_layout()
+        return renderer.fig
+    
+    def render_value_frames(self, value_sets, filename_pattern, color_map='viridis', titles=None,
+                            max_labels=0, dpi=150):
+        """
+        多数の値セットをPNG連番として一括出力（図は1回だけ作成し、pyplot を使わない）
+        
+        Args:
+            value_sets (iterable): ピン順の値配列の並び（assign_values_batch() の結果など）
+            filename_pattern (str): 出力ファイル名の書式（例: 'output/frame_{:04d}.png'）
+            color_map (str): カラーマップ名
+            titles (list, optional): フレームごとのタイトル
+            max_labels (int): 表示するラベル数の上限（既定はラベルなし）
+            dpi (int): 解像度
             
-            # IDの表示
-            if show_values and has_values:
-                # 値を表示
-                ax.text(x, y, f"{pin.value:.1f}", ha='center', va='center', fontsize=8)
-            else:
-                # IDを表示
-                ax.text(x, y, f"S:{pin.id}\nC:{pin.subchannel_id}", ha='center', va='center', fontsize=8)
+        Returns:
+            list: 出力したファイルパス
+        """
+        renderer = PinMapRenderer(self.grid.column('x'), self.grid.column('y'), self.grid.pitch,
+                                  color_map=color_map, max_labels=max_labels, headless=True)
+        return renderer.render_frames(value_sets, filename_pattern, titles=titles, dpi=dpi)
+
+
+# 一括処理で指定できる補間方法
+INTERPOLATION_STRATEGIES = {
+    'three_point': ThreePointInterpolation,
+    'seven_point': SevenPointInterpolation,
+}
+
+# 出力ファイルの拡張子 → 出力ビルダー
+OUTPUT_BUILDERS = {
+    '.csv': CSVOutputBuilder,
+    '.xlsx': ExcelOutputBuilder,
+    '.parquet': ParquetOutputBuilder,
+    '.h5': HDF5OutputBuilder,
+    '.hdf5': HDF5OutputBuilder,
+    '.npz': NPZOutputBuilder,
+}
+
+
+def output_builder_for(filename, **kwargs):
+    """
+    出力ファイルの拡張子に対応する出力ビルダーを作成
+    
+    Args:
+        filename (str): 出力ファイル名
+        **kwargs: 出力ビルダーの引数（chunk_size, progress など）
         
-        # カラーバーの追加（値がある場合のみ）
-        if has_values and show_values:
-            values = [pin.value for pin in self.grid.pins]
-            sm = plt.cm.ScalarMappable(cmap=color_map, norm=Normalize(vmin=min(values), vmax=max(values)))
-            sm.set_array([])
-            cbar = plt.colorbar(sm, ax=ax)
-            cbar.set_label('Value')
+    Returns:
+        OutputBuilder: 出力ビルダー
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in OUTPUT_BUILDERS:
+        raise ValueError(f"未対応のファイル形式です: {filename}")
+    return OUTPUT_BUILDERS[extension](**kwargs)
+
+
+def load_case_file(filename):
+    """
+    一括処理のケースファイル（JSON、PyYAML があれば YAML も可）を読み込む
+    
+    ファイルはケースのリスト、または次の形式の辞書:
+        {
+            "defaults": {"rings": 5, "pitch": 1.0, "strategy": "three_point"},
+            "output": "output/batch.csv",
+            "cases": [
+                {"name": "A1", "inputs": {"center_peak": 100.0, "outer_peak": 80.0, "outer_min": 60.0}},
+                {"name": "A2", "strategy": "seven_point",
+                 "inputs": {"center_peak": 100.0, "vertex_values": [80, 81, 82, 83, 84, 85]}},
+                {"name": "A3", "total_pins": 217, "values_file": "a3_values.csv"}
+            ]
+        }
+    各ケースは defaults で補完される。values_file は螺旋ID順の値（1行1ピン、
+    軸方向分布は1行に複数列）で、相対パスはケースファイルからの相対パス。
+    
+    Args:
+        filename (str): ケースファイル
         
-        # グラフの設定
-        ax.set_aspect('equal')
-        ax.autoscale_view()
-        ax.set_xlabel('X')
-        ax.set_ylabel('Y')
+    Returns:
+        tuple: (ケースの辞書のリスト, 出力ファイル名または None)
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    with open(filename, encoding='utf-8') as f:
+        if extension in ('.yml', '.yaml'):
+            import yaml
+            document = yaml.safe_load(f)
+        else:
+            document = json.load(f)
+    
+    if isinstance(document, list):
+        document = {'cases': document}
+    defaults = document.get('defaults', {})
+    base_dir = os.path.dirname(os.path.abspath(filename))
+    
+    cases = []
+    for i, case in enumerate(document.get('cases', [])):
+        case = {**defaults, **case}
+        case.setdefault('name', f"case{i}")
+        if 'values_file' in case:
+            case['values_file'] = os.path.join(base_dir, case['values_file'])
+        cases.append(case)
+    
+    output = document.get('output')
+    if output is not None:
+        output = os.path.join(base_dir, output)
+    return cases, output
+
+
+def load_value_file(filename):
+    """
+    螺旋ID順のピン値ファイルを読み込む
+    
+    Args:
+        filename (str): .npy、または .csv / .txt（1行1ピン、軸方向分布は1行に複数列）
+        
+    Returns:
+        numpy.ndarray: (ピン数,) または (ピン数, 軸方向点数) の値
+    """
+    if os.path.splitext(filename)[1].lower() == '.npy':
+        return np.load(filename)
+    delimiter = ',' if filename.lower().endswith('.csv') else None
+    values = np.loadtxt(filename, delimiter=delimiter, ndmin=2, dtype=np.float64)
+    return values[:, 0] if values.shape[1] == 1 else values
+
+
+def case_values_from_file(case, spiral_id):
+    """
+    values_file の螺旋ID順の値をピン順に並べ替え
+    
+    Args:
+        case (dict): 'values_file' を持つケース
+        spiral_id (numpy.ndarray): 各ピンの螺旋ID（ピン順）
+        
+    Returns:
+        numpy.ndarray: ピン順の値
+    """
+    spiral_values = load_value_file(case['values_file'])
+    if len(spiral_values) != len(spiral_id):
+        raise ValueError(f"ケース {case['name']}: 値の数 {len(spiral_values)} が"
+                         f"ピン数 {len(spiral_id)} と一致しません")
+    return spiral_values[spiral_id]
+
+
+class SharedArrayBlock:
+    """
+    複数の配列を1つの共有メモリにまとめ、他プロセスから読み取り専用で参照する
+    
+    作成側は spec（共有メモリ名と配置）だけをワーカーに渡し、ワーカーは attach() で
+    コピーせずに参照する。共有メモリの解放は作成側の close() / unlink() で行う。
+    """
+    
+    _attached = {}  # プロセスごとの参照済みブロック（共有メモリ名 → (共有メモリ, 配列)）
+    
+    def __init__(self, arrays):
+        """
+        Args:
+            arrays (dict): 名前 → 配列
+        """
+        from multiprocessing import shared_memory
+        
+        arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+        layout = []
+        offset = 0
+        for name, array in arrays.items():
+            offset = -(-offset // 64) * 64  # 64バイト境界に揃える
+            layout.append((name, array.dtype.str, array.shape, offset))
+            offset += array.nbytes
+        
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.spec = (self.shm.name, tuple(layout))
+        for (name, dtype, shape, offset) in layout:
+            np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)[...] = arrays[name]
+    
+    @staticmethod
+    def _views(shm, layout):
+        """共有メモリ上の読み取り専用ビュー"""
+        views = {}
+        for name, dtype, shape, offset in layout:
+            view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            view.setflags(write=False)
+            views[name] = view
+        return views
+    
+    @classmethod
+    def attach(cls, spec):
+        """
+        spec の共有メモリを参照（同じプロセスでは2回目以降は再利用）
+        
+        Args:
+            spec (tuple): 作成側の SharedArrayBlock.spec
+            
+        Returns:
+            dict: 名前 → 読み取り専用の配列
+        """
+        name, layout = spec
+        if name not in cls._attached:
+            from multiprocessing import shared_memory
+            try:
+                shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                # Python 3.12 以前は参照側も追跡対象に登録されてしまうため、登録を止めて開く
+                # （解放は作成側が行う）
+                from multiprocessing import resource_tracker
+                register = resource_tracker.register
+                resource_tracker.register = lambda name, rtype: None
+                try:
+                    shm = shared_memory.SharedMemory(name=name)
+                finally:
+                    resource_tracker.register = register
+            cls._attached[name] = (shm, cls._views(shm, layout))
+        return cls._attached[name][1]
+    
+    def close(self):
+        """作成側の共有メモリを閉じて解放"""
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _batch_file_worker(spec, case):
+    """並列一括処理のワーカー（値ファイルのケースを共有メモリの螺旋ID順に並べる）"""
+    return case_values_from_file(case, SharedArrayBlock.attach(spec)['spiral_id'])
+
+
+class BatchRunner:
+    """
+    多数の集合体ケースを1プロセスで一括処理する
+    
+    同じ (リング数, ピッチ, 補間方法) のケースは格子と補間重み行列を共有し、
+    入力値だけを並べた行列積で全ケースの値をまとめて計算する。
+    workers を指定すると値ファイルのケースの読み込みをプロセスプールに分配する（螺旋IDは
+    共有メモリで渡し、結果はケース順に並ぶ）。補間ケースの行列積は入力値の数（3〜7）が
+    小さくメモリ帯域で律速されるため、プロセスに分けても結果の受け渡しの方が高くつく。
+    常に親プロセスで1回の行列積として計算し、並列化は NumPy の BLAS のスレッドに任せる
+    （スレッド数は OPENBLAS_NUM_THREADS / MKL_NUM_THREADS などで指定）。
+    """
+    
+    def __init__(self, columnar=True, workers=1):
+        """
+        Args:
+            columnar (bool): ピンデータを列配列で保持するかどうか
+            workers (int, optional): 値ファイルのケースを読み込むプロセス数（1 で逐次処理、None で CPU 数）
+        """
+        self.columnar = columnar
+        self.workers = workers
+        self._tools = {}  # (リング数, ピッチ, 補間方法) → 格子生成済みの PinAssignmentTool
+    
+    def tool_for(self, rings, pitch, strategy=None):
+        """
+        格子生成・ID付与済みのツールを取得（同じ条件のツールは再利用）
+        
+        Args:
+            rings (int): リング数
+            pitch (float): ピン間距離（ピッチ）
+            strategy (str, optional): INTERPOLATION_STRATEGIES のキー
+            
+        Returns:
+            PinAssignmentTool: ツール
+        """
+        key = (rings, pitch, strategy)
+        tool = self._tools.get(key)
+        if tool is None:
+            tool = PinAssignmentTool(rings=rings, pitch=pitch, columnar=self.columnar)
+            tool.generate_grid()
+            tool.convert_to_subchannel_ids()
+            if strategy is not None:
+                if strategy not in INTERPOLATION_STRATEGIES:
+                    raise ValueError(f"未対応の補間方法です: {strategy}")
+                tool.set_interpolation_strategy(INTERPOLATION_STRATEGIES[strategy]())
+            self._tools[key] = tool
+        return tool
+    
+    def _case_tool(self, case):
+        """ケースの設定に対応するツール"""
+        rings = case.get('rings', 5)
+        if case.get('total_pins') is not None:
+            rings = PinAssignmentTool.calculate_rings_from_total_pins(case['total_pins'])
+        strategy = None if 'values_file' in case else case.get('strategy', 'three_point')
+        return self.tool_for(int(rings), float(case.get('pitch', 1.0)), strategy)
+    
+    def run(self, cases):
+        """
+        全ケースの値を計算
         
-        if title:
-            ax.set_title(title)
+        Args:
+            cases (list): ケースの辞書のリスト（load_case_file() の結果など）。
+                各ケースは 'inputs'（補間の入力値）か 'values_file'（螺旋ID順の値）を持つ
+                
+        Returns:
+            list: ケース順の (ケース名, ツール, ピン順の値配列) のリスト
+        """
+        tools = [self._case_tool(case) for case in cases]
+        if self.workers != 1 and len(cases) > 1:
+            results = self._run_parallel(cases, tools)
         else:
-            if show_values and has_values:
-                ax.set_title('ピン配置と代表点値')
-            else:
-                ax.set_title('ピン配置とID')
+            results = self._run_serial(cases, tools)
+        return [(case['name'], tool, values) for case, tool, values in zip(cases, tools, results)]
+    
+    def _run_serial(self, cases, tools):
+        """1プロセスで全ケースを計算"""
+        results = [None] * len(cases)
+        for i, (case, tool) in enumerate(zip(cases, tools)):
+            if 'values_file' in case:
+                results[i] = case_values_from_file(case, tool.grid.column('spiral_id'))
+        self._interpolate_cases(cases, tools, results)
+        return results
+    
+    @staticmethod
+    def _interpolate_cases(cases, tools, results):
+        """補間ケースをツールごとにまとめて1回の行列積で計算し、results のケースの位置に入れる"""
+        groups = {}
+        for i, (case, tool) in enumerate(zip(cases, tools)):
+            if 'values_file' not in case:
+                groups.setdefault(id(tool), (tool, []))[1].append(i)
         
-        # ファイルに保存
-        if filename:
-            plt.savefig(filename, dpi=300, bbox_inches='tight')
+        for tool, indices in groups.values():
+            values = tool.assign_values_batch([cases[i].get('inputs', {}) for i in indices])
+            for i, row in zip(indices, values):
+                results[i] = row
+    
+    def _run_parallel(self, cases, tools):
+        """
+        値ファイルのケースをプロセスプールで読み込み、補間ケースは親プロセスで計算（結果はケース順）
+        """
+        from concurrent.futures import ProcessPoolExecutor
         
-        plt.tight_layout()
-        return fig
+        results = [None] * len(cases)
+        self._interpolate_cases(cases, tools, results)
+        
+        file_cases = [i for i, case in enumerate(cases) if 'values_file' in case]
+        if len(file_cases) < 2:
+            # ファイルが1つならプールを起動しても並列にならない
+            for i in file_cases:
+                results[i] = case_values_from_file(cases[i], tools[i].grid.column('spiral_id'))
+            return results
+        
+        workers = self.workers or os.cpu_count()
+        blocks = {}
+        try:
+            # ツールごとの螺旋IDを共有メモリに1回だけ置く
+            tasks = []
+            for i in file_cases:
+                tool = tools[i]
+                if id(tool) not in blocks:
+                    blocks[id(tool)] = SharedArrayBlock({'spiral_id': tool.grid.column('spiral_id')})
+                tasks.append((i, blocks[id(tool)].spec))
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+                futures = [(i, executor.submit(_batch_file_worker, spec, cases[i])) for i, spec in tasks]
+                for i, future in futures:
+                    results[i] = future.result()
+            return results
+        finally:
+            for block in blocks.values():
+                block.close()
+    
+    @staticmethod
+    def stack(results):
+        """
+        run() の結果の値を1つの配列に積み重ねる（全ケースのピン数が同じ場合）
+        
+        Args:
+            results (list): run() の結果
+            
+        Returns:
+            numpy.ndarray: (ケース数, ピン数[, 軸方向点数]) の値
+        """
+        return np.stack([np.asarray(values, dtype=np.float64) for _, _, values in results])
+    
+    @staticmethod
+    def collect_columns(results):
+        """
+        全ケースの結果を1つの列配列にまとめる（先頭に 'case' 列 = ケース番号）
+        
+        Args:
+            results (list): run() の結果
+            
+        Returns:
+            dict: pin_columns(..., expand_axial=False) の列に 'case' を加えた列配列
+        """
+        if not results:
+            return {'case': np.zeros(0, dtype=np.int64)}
+        value_shapes = {np.shape(values)[1:] for _, _, values in results}
+        if len(value_shapes) > 1:
+            raise ValueError("軸方向点数の異なるケースは1つの出力にまとめられません")
+        
+        parts = []
+        for case_index, (_, tool, values) in enumerate(results):
+            columns = pin_columns(tool.grid.pins, expand_axial=False)
+            columns['value'] = np.asarray(values, dtype=np.float64)
+            parts.append({'case': np.full(len(values), case_index, dtype=np.int64), **columns})
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    
+    def write(self, results, filename, **builder_kwargs):
+        """
+        全ケースの結果を1つのファイルに書き込み（形式は拡張子で選択）
+        
+        Args:
+            results (list): run() の結果
+            filename (str): 出力ファイル名
+            **builder_kwargs: 出力ビルダーの引数（chunk_size, progress など）
+            
+        Returns:
+            str: 出力ファイルパス
+        """
+        builder = output_builder_for(filename, **builder_kwargs)
+        return builder.write_columns(self.collect_columns(results), filename)
+
+
+def batch_main(argv=None):
+    """
+    一括処理のエントリポイント（対話入力なし）
+    
+    Args:
+        argv (list, optional): コマンドライン引数（省略時は sys.argv[1:]）
+        
+    Returns:
+        str: 出力ファイルパス
+    """
+    parser = argparse.ArgumentParser(description="六角格子ピン代表点割り当ての一括処理")
+    parser.add_argument('case_file', help="ケースファイル（.json / .yaml）")
+    parser.add_argument('-o', '--output', help="出力ファイル（拡張子で形式を選択、ケースファイルの指定より優先）")
+    parser.add_argument('--chunk-size', type=int, default=100000, help="一度に書き込む行数")
+    parser.add_argument('--objects', action='store_true', help="列配列ではなく Pin オブジェクトで処理する")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="値ファイルのケースを並列に読み込むプロセス数（0 で CPU 数）。"
+                             "補間ケースの並列化は BLAS のスレッドで行う")
+    args = parser.parse_args(argv)
+    
+    cases, output = load_case_file(args.case_file)
+    output = args.output or output or os.path.join("output", "batch_pin_data.csv")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    
+    runner = BatchRunner(columnar=not args.objects, workers=args.workers or None)
+    results = runner.run(cases)
+    filename = runner.write(results, output, chunk_size=args.chunk_size)
+    print(f"{len(results)} ケースの出力が完了しました: {filename}")
+    return filename
 
 
 def main():
@@ -578,7 +2988,7 @@ def main():
                 print(f"指定されたピン総数 {total_pins} に対応するリング数: {rings}")
                 
                 # 計算されたリング数でのピン総数を表示
-                actual_pins = sum(1 + 6 * i for i in range(rings))
+                actual_pins = hex_pin_count(rings)
                 if actual_pins > total_pins:
                     print(f"注意: 六角格子の構造上、実際のピン総数は {actual_pins} となります")
         except ValueError:
@@ -662,7 +3072,7 @@ def main():
     tool.assign_values(input_values)
     
     # 出力形式の選択
-    output_format = input("出力形式を選択してください（1: CSV, 2: Excel）[1]: ") or "1"
+    output_format = input("出力形式を選択してください（1: CSV, 2: Excel, 3: Parquet, 4: HDF5, 5: NPZ）[1]: ") or "1"
     
     # 出力ディレクトリの作成
     output_dir = "output"
@@ -674,6 +3084,16 @@ def main():
         tool.set_output_builder(csv_builder)
         csv_file = tool.generate_output(os.path.join(output_dir, "pin_data.csv"))
         print(f"CSV出力が完了しました: {csv_file}")
+    elif output_format in ("3", "4", "5"):
+        # バイナリ出力
+        builder_class, extension = {
+            "3": (ParquetOutputBuilder, "parquet"),
+            "4": (HDF5OutputBuilder, "h5"),
+            "5": (NPZOutputBuilder, "npz"),
+        }[output_format]
+        tool.set_output_builder(builder_class())
+        binary_file = tool.generate_output(os.path.join(output_dir, f"pin_data.{extension}"))
+        print(f"バイナリ出力が完了しました: {binary_file}")
     else:
         # Excel出力
         excel_builder = ExcelOutputBuilder()
@@ -707,4 +3127,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 引数があれば一括処理、なければ対話モード
+    if len(sys.argv) > 1:
+        batch_main()
+    else:
+        main()
\ No newline at end of file